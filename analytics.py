@@ -1,44 +1,41 @@
 # analytics.py
-import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
-from memory_sqlite import SQLiteMemoryManager
+from memory_shards import create_memory_manager
 from intent_optimizer import IntentOptimizer
+from settings import settings
 
 logger = logging.getLogger(__name__)
 
 class Analytics:
-    def __init__(self):
-        self.memory_manager = SQLiteMemoryManager()
+    def __init__(self, memory_manager=None):
+        # Uygulamanın yöneticisi verilmezse ayarlardan (parçalama dahil) oluşturulur ve close() ile kapatılır
+        self._owns_manager = memory_manager is None
+        self.memory_manager = memory_manager if memory_manager is not None else create_memory_manager(settings, preload_index=False)
         self.intent_optimizer = IntentOptimizer()
         
+    def close(self):
+        """Kendi oluşturduğu bellek yöneticisini kapatır"""
+        if self._owns_manager:
+            self.memory_manager.close()
+        
     def get_usage_stats(self, days: int = 30) -> Dict[str, Any]:
         """Kullanım istatistiklerini getir"""
         try:
-            memories = self.memory_manager.load_memory()
-            df = pd.DataFrame(memories)
-            
-            if df.empty:
-                return {
-                    "total_interactions": 0,
-                    "active_users": 0,
-                    "avg_response_time": 0,
-                    "success_rate": 0
-                }
-            
-            # Tarih filtreleme
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            start_date = datetime.now() - timedelta(days=days)
-            df = df[df['created_at'] >= start_date]
+            # Tarih filtresi veritabanında uygulanır, yalnızca skor sütunu yüklenir
+            start_date = datetime.now(timezone.utc) - timedelta(days=days)
+            scores = self.memory_manager.load_columns(["avg_match_score"],
+                                                      filters={"created_after": start_date})["avg_match_score"]
+            total = len(scores)
             
-            # İstatistikleri hesapla
+            # İstatistikleri hesapla (kullanıcı ve yanıt süresi bellek tablosunda tutulmuyor)
             stats = {
-                "total_interactions": len(df),
-                "active_users": df['user_id'].nunique() if 'user_id' in df.columns else 0,
-                "avg_response_time": df['response_time'].mean() if 'response_time' in df.columns else 0,
-                "success_rate": (df['avg_match_score'] >= 0.7).mean() if 'avg_match_score' in df.columns else 0
+                "total_interactions": total,
+                "active_users": 0,
+                "avg_response_time": 0,
+                "success_rate": float((np.nan_to_num(scores) >= 0.7).mean()) if total else 0
             }
             
             return stats
@@ -80,28 +77,31 @@ class Analytics:
     def get_emotion_analytics(self) -> Dict[str, Any]:
         """Duygu analitiği getir"""
         try:
-            memories = self.memory_manager.load_memory()
-            df = pd.DataFrame(memories)
-            
-            if df.empty or 'emotion' not in df.columns:
-                return {
-                    "emotion_distribution": {},
-                    "emotion_trends": {},
-                    "emotion_triggers": {}
-                }
+            memories = self.memory_manager.load_columns(["prompt", "emotion", "created_at"])
+            codes = memories.codes["emotion"]
+            emotions = memories.categories["emotion"]
             
             # Duygu dağılımı
-            emotion_dist = df['emotion'].value_counts().to_dict()
-            
-            # Duygu trendleri
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            emotion_trends = df.groupby([
-                df['created_at'].dt.date,
-                'emotion'
-            ]).size().unstack(fill_value=0).to_dict()
+            emotion_dist = memories.value_counts("emotion")
+            
+            # Duygu trendleri: duygu -> gün -> kayıt sayısı (kaydı olmayan günler 0)
+            created = memories.numeric["created_at"]
+            dated = ~np.isnan(created)
+            days = (created[dated] // 86400).astype(np.int64)
+            unique_days, day_index = np.unique(days, return_inverse=True)
+            counts = np.zeros((len(emotions), len(unique_days)), dtype=np.int64)
+            np.add.at(counts, (codes[dated], day_index), 1)
+            dates = [datetime.fromtimestamp(int(day) * 86400, timezone.utc).date() for day in unique_days]
+            emotion_trends = {
+                emotion: dict(zip(dates, counts[code].tolist()))
+                for code, emotion in enumerate(emotions)
+            }
             
             # Duygu tetikleyicileri
-            emotion_triggers = df.groupby('emotion')['prompt'].agg(list).to_dict()
+            emotion_triggers = {
+                emotion: memories.text["prompt"].take(np.flatnonzero(codes == code))
+                for code, emotion in enumerate(emotions)
+            }
             
             return {
                 "emotion_distribution": emotion_dist,
@@ -116,10 +116,10 @@ class Analytics:
     def get_performance_metrics(self) -> Dict[str, float]:
         """Performans metriklerini getir"""
         try:
-            memories = self.memory_manager.load_memory()
-            df = pd.DataFrame(memories)
+            scores = np.nan_to_num(self.memory_manager.load_columns(["avg_match_score"])["avg_match_score"])
+            total = len(scores)
             
-            if df.empty:
+            if not total:
                 return {
                     "avg_response_time": 0,
                     "avg_match_score": 0,
@@ -128,10 +128,10 @@ class Analytics:
                 }
             
             metrics = {
-                "avg_response_time": df['response_time'].mean() if 'response_time' in df.columns else 0,
-                "avg_match_score": df['avg_match_score'].mean() if 'avg_match_score' in df.columns else 0,
-                "success_rate": (df['avg_match_score'] >= 0.7).mean() if 'avg_match_score' in df.columns else 0,
-                "memory_utilization": len(df) / 10000  # Maksimum bellek kapasitesine göre
+                "avg_response_time": 0,
+                "avg_match_score": float(scores.mean()),
+                "success_rate": float((scores >= 0.7).mean()),
+                "memory_utilization": total / 10000  # Maksimum bellek kapasitesine göre
             }
             
             return metrics
@@ -4,11 +4,11 @@ from settings import settings
 from match_logger import log_match
 from intent_classifier import predict_intent
 from prompt_variants import is_paraphrase
-from memory_sqlite import SQLiteMemoryManager
+from memory_shards import ShardedMemoryManager, create_memory_manager
 import logging
 from datetime import datetime
 import asyncio
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterable
 from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
@@ -65,8 +65,15 @@ class CloudAI:
         device = self._get_device()
         self.model = self._load_model(device)
         
-        # SQLite bellek yöneticisi
-        self.memory_manager = SQLiteMemoryManager()
+        # SQLite bellek yöneticisi (parçalama açıksa kiracı başına ayrı veritabanı)
+        self.memory_manager = create_memory_manager(settings)
+        self.memory_manager.start_consolidation(
+            settings.get("MEMORY_CONSOLIDATION_INTERVAL", 0),
+            threshold=settings.get("MEMORY_CONSOLIDATION_THRESHOLD", 0.95)
+        )
+        self.search_mode = settings.get("MEMORY_SEARCH_MODE", "vector")
+        self.bm25_confidence = settings.get("MEMORY_BM25_CONFIDENCE", 1.5)
+        self.bm25_min_coverage = settings.get("MEMORY_BM25_MIN_COVERAGE", 0.5)
         
         # Yapılandırma
         self._load_config()
@@ -307,6 +314,27 @@ class CloudAI:
             logger.error(f"Metin kodlama hatası: {str(e)}")
             return None
 
+    def set_user(self, user_id: Optional[str]):
+        """Parçalama açıksa bu bağlamdaki bellek işlemlerini kullanıcının parçasına yönlendirir.
+
+        Kiracı bağlama (iş parçacığı / asyncio görevi) bağlıdır; Streamlit her
+        yeniden çalıştırmayı yeni bir iş parçacığında yaptığından her istek
+        başında yeniden çağrılmalıdır.
+        """
+        if isinstance(self.memory_manager, ShardedMemoryManager):
+            self.memory_manager.set_tenant(None if user_id is None else str(user_id))
+
+    def encode_texts(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Metinleri toplu olarak vektöre dönüştürür"""
+        try:
+            texts = [self.preprocess_text(text) for text in texts]
+            with torch.no_grad():
+                embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+            return np.asarray(embeddings, dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Toplu metin kodlama hatası: {str(e)}")
+            raise
+
     def is_meaningful_input(self, text: str) -> bool:
         """Girişin anlamlı olup olmadığını kontrol et"""
         try:
@@ -325,13 +353,28 @@ class CloudAI:
             logger.error(f"Giriş kontrolü hatası: {str(e)}")
             return False
 
-    async def process_message(self, message: str) -> Optional[str]:
+    def _find_text_response(self, message: str) -> Optional[Dict[str, Any]]:
+        """Hibrit modda BM25'in tek başına emin olduğu yanıtı döner"""
+        if self.search_mode != "hybrid":
+            return None
+        return self.memory_manager.find_text_response(message, confidence_ratio=self.bm25_confidence,
+                                                      min_coverage=self.bm25_min_coverage)
+
+    async def process_message(self, message: str, user_id: Optional[str] = None) -> Optional[str]:
         """Kullanıcı mesajını işle ve yanıt üret"""
         try:
+            if user_id is not None:
+                self.set_user(user_id)
+                
             # Giriş kontrolü
             if not self.is_meaningful_input(message):
                 return "Lütfen geçerli bir mesaj girin."
                 
+            # Birebir aynı mesaj daha önce öğrenildiyse model hiç çalıştırılmaz
+            exact = self.memory_manager.find_exact_response(message) or self._find_text_response(message)
+            if exact:
+                return exact["response"]
+                
             # Mesaj vektörünü hesapla
             message_embedding = self.encode_text(message)
             
@@ -347,9 +390,12 @@ class CloudAI:
             logger.error(f"Mesaj işleme hatası: {str(e)}")
             return None
 
-    async def learn(self, prompt: str, response: str, intent: str = "genel") -> bool:
+    async def learn(self, prompt: str, response: str, intent: str = "genel", user_id: Optional[str] = None) -> bool:
         """Yeni bir prompt-yanıt çifti öğren"""
         try:
+            if user_id is not None:
+                self.set_user(user_id)
+                
             # Giriş kontrolü
             if not self.is_meaningful_input(prompt) or not self.is_meaningful_input(response):
                 return False
@@ -382,6 +428,22 @@ class CloudAI:
             logger.error(f"Öğrenme hatası: {str(e)}")
             return False
 
+    async def learn_many(self, pairs: Iterable[Dict[str, Any]], chunk_size: int = 1000,
+                         user_id: Optional[str] = None) -> int:
+        """Prompt-yanıt çiftlerini toplu öğren; eklenen kayıt sayısını döner"""
+        try:
+            if user_id is not None:
+                self.set_user(user_id)
+            valid = (pair for pair in pairs
+                     if self.is_meaningful_input(pair.get("prompt")) and self.is_meaningful_input(pair.get("response")))
+            memory_ids = self.memory_manager.add_memories(valid, encode=self.encode_texts, chunk_size=chunk_size)
+            added = sum(memory_id is not None for memory_id in memory_ids)
+            logger.info(f"{added} bellek toplu eklendi")
+            return added
+        except Exception as e:
+            logger.error(f"Toplu öğrenme hatası: {str(e)}")
+            return 0
+
     def get_training_data(self, intent: str = None, limit: int = 100) -> List[Dict[str, Any]]:
         """Eğitim verilerini getir"""
         try:
@@ -670,19 +732,29 @@ class CloudAI:
             logger.error(f"Yanıt kişiselleştirme hatası: {str(e)}")
             return response
 
-    def sync_process_message(self, message: str) -> tuple[str, float]:
+    def sync_process_message(self, message: str, user_id: Optional[str] = None) -> tuple[str, float]:
         """Mesajı işle ve yanıt döndür"""
         try:
+            # Parçalama açıksa bellek işlemleri kullanıcının parçasına gider
+            if user_id is not None:
+                self.set_user(user_id)
+                
             # Mesajı ön işle
             processed_message = self.preprocess_text(message)
             logger.debug(f"İşlenmiş mesaj: {processed_message}")
             
-            # Embedding hesapla
-            message_embedding = self.encode_text(processed_message)
-            logger.debug("Embedding hesaplandı")
-            
-            # Intent belirle
-            intent = predict_intent(processed_message)
+            # Birebir (veya emin BM25) eşleşme varsa embedding ve intent tahmini atlanır
+            exact = self.memory_manager.find_exact_response(processed_message) or self._find_text_response(processed_message)
+            if exact:
+                intent = exact["intent"]
+                logger.debug(f"Birebir eşleşme: {exact['id']}")
+            else:
+                # Embedding hesapla
+                message_embedding = self.encode_text(processed_message)
+                logger.debug("Embedding hesaplandı")
+                
+                # Intent belirle
+                intent, _ = predict_intent(processed_message)
             logger.debug(f"Intent: {intent}")
             
             # Duygu analizi
@@ -700,28 +772,40 @@ class CloudAI:
             # Bağlamı güncelle
             self.update_context(processed_message, intent)
             
-            # Yanıt oluştur
-            response = self.generate_response(processed_message, intent)
-            logger.debug(f"Oluşturulan yanıt: {response}")
+            # Hafızada yeterince benzer bir yanıt varsa onu kullan, yoksa yanıt oluştur
+            if exact:
+                response = exact["response"]
+                logger.debug(f"Hafızadan birebir yanıt: {response}")
+            else:
+                memory_response, similarity = self.memory_manager.find_best_response(
+                    message_embedding, intent=intent, min_score=self.confidence_threshold
+                )
+                if memory_response and similarity >= self.confidence_threshold:
+                    response = memory_response
+                    logger.debug(f"Hafızadan yanıt: {response} ({similarity})")
+                else:
+                    response = self.generate_response(processed_message, intent)
+                    logger.debug(f"Oluşturulan yanıt: {response}")
             
             # Öğrenme sistemini güncelle
             self.update_learning_system(processed_message, response)
             
-            # Yanıtı hafızaya ekle
-            try:
-                memory_data = {
-                    "prompt": processed_message,
-                    "response": response,
-                    "embedding": message_embedding,
-                    "intent": intent,
-                    "emotion": emotion_data["emotion"],
-                    "created_at": datetime.now().isoformat()
-                }
+            # Yanıtı hafızaya ekle (birebir eşleşmede kayıt zaten var, kullanım sayısı artırıldı)
+            if not exact:
+                try:
+                    memory_data = {
+                        "prompt": processed_message,
+                        "response": response,
+                        "embedding": message_embedding,
+                        "intent": intent,
+                        "emotion": emotion_data["emotion"],
+                        "created_at": datetime.now().isoformat()
+                    }
                 
-                self.memory_manager.add_memory(memory_data)
-                logger.debug("Hafızaya eklendi")
-            except Exception as e:
-                logger.error(f"Hafıza ekleme hatası: {str(e)}")
+                    self.memory_manager.add_memory(memory_data)
+                    logger.debug("Hafızaya eklendi")
+                except Exception as e:
+                    logger.error(f"Hafıza ekleme hatası: {str(e)}")
             
             # Güven skorunu hesapla
             try:
@@ -904,6 +988,7 @@ class CloudAI:
         try:
             # Veritabanı bağlantılarını kapat
             if hasattr(self, 'memory_manager'):
+                self.memory_manager.close()
                 del self.memory_manager
                 
             # PyTorch modelini temizle
@@ -245,7 +245,9 @@ class ChatPanel:
             st.session_state.messages.append({"role": "user", "content": message})
             
             # AI yanıtını al
-            response, confidence = self.cloud_ai.sync_process_message(message)
+            response, confidence = self.cloud_ai.sync_process_message(
+                message, user_id=st.session_state.get("user_id")
+            )
             
             if response:
                 # Yanıtı session state'e ekle
@@ -43,6 +43,12 @@ class MemoryListPanel:
             with col2:
                 date_filter = st.date_input("Tarih Filtresi")
             
+            # Arama terimi varsa yerel hafızada BM25 ile ara
+            if search_term.strip():
+                self.render_search_results(search_term)
+                st.markdown('</div>', unsafe_allow_html=True)
+                return
+            
             # Hafıza listesi
             memories = self.app.supabase.table('training_data').select('*').execute()
             
@@ -59,3 +65,25 @@ class MemoryListPanel:
                 st.info("Henüz hafızada kayıtlı veri bulunmuyor.")
             
             st.markdown('</div>', unsafe_allow_html=True)
+
+    def render_search_results(self, search_term: str):
+        """Yerel hafızadaki anahtar kelime arama sonuçlarını göster"""
+        try:
+            results = self.app.cloud_ai.memory_manager.search_text(search_term, k=50)
+        except Exception as e:
+            self.logger.error(f"Hafıza arama hatası: {str(e)}")
+            results = []
+        
+        if not results:
+            st.info("Aramayla eşleşen kayıt bulunamadı.")
+            return
+        
+        for memory in results:
+            with st.container():
+                st.markdown('<div class="memory-item">', unsafe_allow_html=True)
+                st.write(f"**Prompt:** {memory['prompt']}")
+                st.write(f"**Yanıt:** {memory['response']}")
+                st.write(f"**Intent:** {memory['intent']}")
+                st.write(f"**BM25 Skoru:** {memory['score']:.2f}")
+                st.write(f"**Tarih:** {memory['created_at']}")
+                st.markdown('</div>', unsafe_allow_html=True)
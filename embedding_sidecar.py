@@ -0,0 +1,190 @@
+# embedding_sidecar.py
+import numpy as np
+import logging
+import os
+import struct
+import threading
+from typing import Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Süreçler arası kilit için opsiyonel bağımlılık (Windows'ta yok)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HEADER_SIZE = 256
+MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def record_dtype(dim: int) -> np.dtype:
+    """Sidecar kayıt tipi: bellek id'si ve normalize float32 vektör"""
+    return np.dtype([("id", "<i8"), ("vector", "<f4", (dim,))])
+
+
+class EmbeddingSidecar:
+    """memory.db yanında duran, yalnızca sona eklenen, bellek id'siyle anahtarlanmış embedding dosyası.
+
+    Dosya sabit boyutlu başlığa sahip geçerli bir .npy dosyasıdır; tüm süreçler
+    aynı sayfaları np.memmap ile kopyasız paylaşır. Güncellemeler yeni kayıt
+    olarak eklenir (son kayıt geçerlidir), silmeler negatif id'li kayıtlarla
+    işaretlenir. Sıkıştırma dosyayı yeniden yazıp atomik olarak değiştirir.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.dim: Optional[int] = None
+        self.dtype: Optional[np.dtype] = None
+        self.count = 0
+        self._inode = None
+        self._map = None
+        self.lock = threading.RLock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Kayıt id'leri (silme kayıtları negatif)"""
+        return self._map["id"] if self._map is not None else np.empty(0, dtype=np.int64)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Kayıt vektörleri, (count, dim) boyutunda salt okunur görünüm"""
+        if self._map is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._map["vector"]
+
+    def _header(self, count: int) -> bytes:
+        """Sabit boyutlu .npy başlığı; sayaç büyüdükçe yerinde yeniden yazılır"""
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (count,)}
+        body = repr(header).encode("latin1")
+        padding = HEADER_SIZE - len(MAGIC) - 2 - len(body) - 1
+        return MAGIC + struct.pack("<H", len(body) + padding + 1) + body + b" " * padding + b"\n"
+
+    def _read_header(self, f):
+        f.seek(0)
+        version = np.lib.format.read_magic(f)
+        if version != (1, 0):
+            raise ValueError(f"Desteklenmeyen sidecar sürümü: {version}")
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        if f.tell() != HEADER_SIZE:
+            raise ValueError("Sidecar başlık boyutu geçersiz")
+        return shape[0], dtype
+
+    class _FileLock:
+        """Dosya yeniden yazılsa da sabit kalan .lock dosyası üzerinde süreçler arası kilit"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self.handle = None
+
+        def __enter__(self):
+            self.handle = open(self.path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+            return self
+
+        def __exit__(self, *exc):
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            self.handle.close()
+
+    def _file_lock(self):
+        return self._FileLock(self.lock_path)
+
+    def create(self, dim: int):
+        """Boş bir sidecar dosyası oluşturur (varsa üzerine yazar)"""
+        with self.lock, self._file_lock():
+            self.dim = dim
+            self.dtype = record_dtype(dim)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self._header(0))
+            os.replace(tmp_path, self.path)
+            self._inode = None
+            self.refresh()
+
+    def open(self) -> bool:
+        """Var olan dosyayı eşler"""
+        with self.lock:
+            if not self.exists():
+                return False
+            with open(self.path, "rb") as f:
+                _, dtype = self._read_header(f)
+            self.dtype = dtype
+            self.dim = dtype["vector"].shape[0]
+            self._inode = None
+            self.refresh()
+            return True
+
+    def refresh(self) -> bool:
+        """Diğer süreçlerin eklediği kayıtları görmek için eşlemeyi yeniler.
+
+        Dosya sıkıştırılarak değiştirildiyse True döner; bu durumda satır
+        numaraları değişmiştir ve okuyucunun baştan yüklemesi gerekir.
+        """
+        with self.lock:
+            stat = os.stat(self.path)
+            replaced = self._inode is not None and stat.st_ino != self._inode
+            with open(self.path, "rb") as f:
+                count, _ = self._read_header(f)
+            if count != self.count or replaced or self._inode is None:
+                self._map = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,)) if count else None
+                self.count = count
+            self._inode = stat.st_ino
+            return replaced
+
+    def _append_records(self, records: np.ndarray) -> int:
+        with self.lock, self._file_lock():
+            with open(self.path, "r+b") as f:
+                count, _ = self._read_header(f)
+                f.seek(HEADER_SIZE + count * self.dtype.itemsize)
+                f.write(records.tobytes())
+                f.flush()
+                # Başlık, kayıtlar yazıldıktan sonra güncellenir; okuyucular yarım kayıt görmez
+                f.seek(0)
+                f.write(self._header(count + len(records)))
+            return count
+
+    def append(self, ids: List[int], vectors: np.ndarray) -> int:
+        """Normalize vektörleri ekler, ilk yeni kaydın satır numarasını döner"""
+        records = np.zeros(len(ids), dtype=self.dtype)
+        records["id"] = ids
+        records["vector"] = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        return self._append_records(records)
+
+    def append_deletes(self, ids: List[int]) -> int:
+        """Silinen id'ler için negatif id'li kayıt ekler"""
+        records = np.zeros(len(ids), dtype=self.dtype)
+        records["id"] = -np.asarray(ids, dtype=np.int64)
+        return self._append_records(records)
+
+    def compact(self, keep_rows: np.ndarray, expected_count: int) -> bool:
+        """Yalnızca verilen satırları tutarak dosyayı yeniden yazar.
+
+        Başka bir süreç bu arada kayıt eklediyse işlem yapılmaz ve False döner.
+        """
+        with self.lock, self._file_lock():
+            with open(self.path, "rb") as f:
+                count, _ = self._read_header(f)
+            if count != expected_count:
+                return False
+            kept = np.asarray(self._map[keep_rows]) if len(keep_rows) else np.zeros(0, dtype=self.dtype)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self._header(len(kept)))
+                f.write(kept.tobytes())
+            os.replace(tmp_path, self.path)
+            self._map = None
+            self.count = 0
+            self._inode = None
+            self.refresh()
+            logger.debug(f"Embedding sidecar sıkıştırıldı: {count} -> {len(kept)} kayıt")
+            return True
+
+    def truncate(self):
+        """Tüm kayıtları siler"""
+        self.create(self.dim)
@@ -1,20 +1,29 @@
 # export_tools.py
 import json
 import csv
-from memory_sqlite import SQLiteMemoryManager
+from memory_sqlite import LOAD_MEMORY_COLUMNS
+from memory_shards import memory_manager
 
-def export_training_json(path="training_export.json"):
-    db = SQLiteMemoryManager()
-    memory = db.load_memory()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(memory, f, indent=4, ensure_ascii=False)
+def export_training_json(path="training_export.json", db=None, tenant=None):
+    # db verilmezse ayarlardan (parçalama dahil) oluşturulur ve sonunda kapatılır
+    # Kayıtlar sayfa sayfa okunup yazılır; tüm tablo belleğe alınmaz
+    with memory_manager(db, tenant) as db, open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        count = 0
+        for item in db.iter_memories(LOAD_MEMORY_COLUMNS):
+            f.write(",\n    " if count else "\n    ")
+            f.write(json.dumps(item, indent=4, ensure_ascii=False).replace("\n", "\n    "))
+            count += 1
+        f.write("\n]" if count else "]")
 
-def export_training_csv(path="training_export.csv"):
-    db = SQLiteMemoryManager()
-    memory = db.load_memory()
-    if memory:
-        keys = list(memory[0].keys())
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(memory)
+def export_training_csv(path="training_export.csv", db=None, tenant=None):
+    with memory_manager(db, tenant) as db:
+        memories = db.iter_memories(LOAD_MEMORY_COLUMNS)
+        first = next(memories, None)
+        if first:
+            keys = list(first.keys())
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=keys)
+                writer.writeheader()
+                writer.writerow(first)
+                writer.writerows(memories)
@@ -1,5 +1,6 @@
 # intent_classifier.py
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
+from sentence_transformers import SentenceTransformer
 
 model = SentenceTransformer('all-MiniLM-L6-v2')
 
@@ -26,17 +27,30 @@ INTENT_LIBRARY = {
     "sistemsel": ["ayarları sıfırla", "verilerimi sil", "hesabımı kapat"]
 }
 
+# Örnek cümlelerin etiketleri ve normalize embedding matrisi (ilk tahminde bir kez hesaplanır)
+_LIBRARY_INTENTS = [intent for intent, examples in INTENT_LIBRARY.items() for _ in examples]
+_library_embeddings = None
+
+
+def _library_matrix() -> np.ndarray:
+    global _library_embeddings
+    if _library_embeddings is None:
+        examples = [ex for examples in INTENT_LIBRARY.values() for ex in examples]
+        _library_embeddings = np.asarray(
+            model.encode(examples, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+    return _library_embeddings
+
+
 def predict_intent(text):
-    text_emb = model.encode(text, convert_to_tensor=True)
+    text_emb = np.asarray(model.encode(text, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
     best_intent = "genel"
     best_score = 0.5
 
-    for intent, examples in INTENT_LIBRARY.items():
-        for ex in examples:
-            ex_emb = model.encode(ex, convert_to_tensor=True)
-            score = float(util.pytorch_cos_sim(text_emb, ex_emb))
-            if score > best_score:
-                best_score = score
-                best_intent = intent
+    # Tüm örneklerle kosinüs benzerliği tek matris çarpımıyla hesaplanır
+    scores = _library_matrix() @ text_emb
+    best = int(np.argmax(scores))
+    if float(scores[best]) > best_score:
+        best_score = float(scores[best])
+        best_intent = _LIBRARY_INTENTS[best]
 
     return best_intent, best_score
@@ -5,7 +5,7 @@ import logging
 from datetime import datetime
 from sentence_transformers import SentenceTransformer, util
 from collections import defaultdict
-from memory_sqlite import SQLiteMemoryManager
+from memory_shards import memory_manager
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +13,12 @@ model = SentenceTransformer("all-MiniLM-L6-v2")
 
 # Gruplar = benzer intent'e sahip kayıtlar
 
-def suggest_intent_clusters(threshold=0.8):
-    db = SQLiteMemoryManager()
-    memory = db.load_memory()
+def suggest_intent_clusters(threshold=0.8, db=None, tenant=None):
+    # Yalnızca intent sütunu kod dizisi olarak yüklenir; tekil intent'ler ilk görüldükleri
+    # sırayla birer kez karşılaştırılır
+    with memory_manager(db, tenant) as db:
+        intents = db.load_columns(["intent"]).categories["intent"]
+    memory = [{"intent": intent} for intent in intents]
     groups = []
     used = set()
 
@@ -0,0 +1,194 @@
+# memory_columns.py
+import numpy as np
+import json
+import logging
+from typing import Optional, List, Dict, Any, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Sayısal sütunlar ve tipleri (zaman damgaları Unix saniyesi, eksikse NaN)
+NUMERIC_COLUMNS = {
+    "id": np.int64,
+    "priority": np.int64,
+    "usage_count": np.int64,
+    "avg_match_score": np.float64,
+    "created_at": np.float64,
+    "last_used": np.float64,
+}
+# Tekrarlayan küçük bir değer kümesinden oluşan, kod dizisi olarak tutulan sütunlar
+CATEGORY_COLUMNS = ("intent", "category", "emotion")
+# UTF-8 tampon + ofsetlerle tutulan, erişildikçe çözülen metin sütunları
+TEXT_COLUMNS = ("prompt", "response", "context_message", "tags")
+
+
+class TextColumn:
+    """Metinleri tek bir UTF-8 tamponunda ofsetlerle tutar; satır başına Python nesnesi oluşturmaz.
+
+    None değerler ayrı bir maskeyle işaretlenir. ``tags`` gibi JSON sütunları
+    erişimde çözülür.
+    """
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray, missing: np.ndarray, json_encoded: bool = False):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.missing = missing
+        self.json_encoded = json_encoded
+
+    @classmethod
+    def from_values(cls, values: Sequence[Optional[str]], json_encoded: bool = False) -> "TextColumn":
+        encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        missing = np.fromiter((value is None for value in values), dtype=bool, count=len(encoded))
+        return cls(buffer, offsets, missing, json_encoded)
+
+    @classmethod
+    def concatenate(cls, parts: List["TextColumn"], json_encoded: bool = False) -> "TextColumn":
+        if not parts:
+            return cls.from_values([], json_encoded)
+        sizes = np.cumsum([0] + [len(part.buffer) for part in parts[:-1]])
+        offsets = np.concatenate([parts[0].offsets[:1]] + [part.offsets[1:] + size for part, size in zip(parts, sizes)])
+        return cls(np.concatenate([part.buffer for part in parts]), offsets,
+                   np.concatenate([part.missing for part in parts]), json_encoded)
+
+    def __len__(self) -> int:
+        return len(self.missing)
+
+    def __getitem__(self, row: int) -> Any:
+        if self.missing[row]:
+            return [] if self.json_encoded else None
+        text = self.buffer[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+        if self.json_encoded:
+            return json.loads(text) if text else []
+        return text
+
+    def take(self, rows: Optional[np.ndarray] = None) -> List[Any]:
+        """Verilen satırların (varsayılan tümü) çözülmüş değerleri"""
+        rows = range(len(self)) if rows is None else rows
+        return [self[int(row)] for row in rows]
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes + self.offsets.nbytes + self.missing.nbytes
+
+
+class MemoryColumns:
+    """Bellek kayıtlarının sütun tabanlı gösterimi.
+
+    Sayısal sütunlar NumPy dizileri, intent/category/emotion ``codes`` (int32) ve
+    ``categories`` (ilk görülme sırasıyla tekil değerler) olarak, metinler
+    TextColumn olarak tutulur. Satır başına sözlük gerekirse ``row()`` veya
+    ``records()`` kullanılır.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.numeric: Dict[str, np.ndarray] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, List[str]] = {}
+        self.text: Dict[str, TextColumn] = {}
+
+    def __len__(self) -> int:
+        for store in (self.numeric, self.codes, self.text):
+            for column in store.values():
+                return len(column)
+        return 0
+
+    def __getitem__(self, name: str) -> Any:
+        """Sayısal sütun dizisi, kategori için çözülmüş değerler, metin için TextColumn"""
+        if name in self.numeric:
+            return self.numeric[name]
+        if name in self.codes:
+            return self.labels(name)
+        if name in self.text:
+            return self.text[name]
+        raise KeyError(name)
+
+    def labels(self, name: str, rows: Optional[np.ndarray] = None) -> List[str]:
+        """Kategori kodlarını değerlerine çevirir"""
+        codes = self.codes[name] if rows is None else self.codes[name][rows]
+        categories = self.categories[name]
+        return [categories[code] for code in codes]
+
+    def code_of(self, name: str, value: str) -> int:
+        """Değerin kategori kodu; hiç geçmiyorsa -1"""
+        try:
+            return self.categories[name].index(value)
+        except ValueError:
+            return -1
+
+    def value_counts(self, name: str) -> Dict[str, int]:
+        """Kategori değerlerinin kayıt sayıları, çoktan aza"""
+        counts = np.bincount(self.codes[name], minlength=len(self.categories[name]))
+        order = np.argsort(-counts, kind="stable")
+        return {self.categories[name][code]: int(counts[code]) for code in order if counts[code]}
+
+    def row(self, row: int) -> Dict[str, Any]:
+        record = {}
+        for name in self.columns:
+            if name in self.numeric:
+                value = self.numeric[name][row]
+                record[name] = None if isinstance(value, np.floating) and np.isnan(value) else value.item()
+            elif name in self.codes:
+                record[name] = self.categories[name][self.codes[name][row]]
+            else:
+                record[name] = self.text[name][row]
+        return record
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [self.row(row) for row in range(len(self))]
+
+    @property
+    def nbytes(self) -> int:
+        """Dizilerin kapladığı yaklaşık bellek"""
+        return (sum(column.nbytes for column in self.numeric.values())
+                + sum(column.nbytes for column in self.codes.values())
+                + sum(column.nbytes for column in self.text.values()))
+
+
+class MemoryColumnsBuilder:
+    """Sayfa sayfa okunan satırlardan MemoryColumns oluşturur"""
+
+    def __init__(self, columns: List[str]):
+        unknown = [name for name in columns
+                   if name not in NUMERIC_COLUMNS and name not in CATEGORY_COLUMNS and name not in TEXT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Sütun tabanlı gösterimde desteklenmeyen sütunlar: {unknown}")
+        self.columns = list(columns)
+        self._numeric: Dict[str, List[np.ndarray]] = {name: [] for name in columns if name in NUMERIC_COLUMNS}
+        self._codes: Dict[str, List[np.ndarray]] = {name: [] for name in columns if name in CATEGORY_COLUMNS}
+        self._lookup: Dict[str, Dict[str, int]] = {name: {} for name in self._codes}
+        self._text: Dict[str, List[TextColumn]] = {name: [] for name in columns if name in TEXT_COLUMNS}
+
+    def append(self, rows: List[tuple]):
+        """self.columns sırasındaki değerlerden oluşan satırları ekler"""
+        if not rows:
+            return
+        for position, name in enumerate(self.columns):
+            values = [row[position] for row in rows]
+            if name in self._numeric:
+                dtype = NUMERIC_COLUMNS[name]
+                if dtype is np.float64:
+                    column = np.array([np.nan if value is None else value for value in values], dtype=dtype)
+                else:
+                    column = np.array([0 if value is None else value for value in values], dtype=dtype)
+                self._numeric[name].append(column)
+            elif name in self._codes:
+                lookup = self._lookup[name]
+                self._codes[name].append(np.fromiter(
+                    (lookup.setdefault(value, len(lookup)) for value in values), dtype=np.int32, count=len(values)))
+            else:
+                self._text[name].append(TextColumn.from_values(values, json_encoded=name == "tags"))
+
+    def build(self) -> MemoryColumns:
+        result = MemoryColumns(self.columns)
+        for name, parts in self._numeric.items():
+            result.numeric[name] = np.concatenate(parts) if parts else np.empty(0, dtype=NUMERIC_COLUMNS[name])
+        for name, parts in self._codes.items():
+            result.codes[name] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+            result.categories[name] = list(self._lookup[name])
+        for name, parts in self._text.items():
+            result.text[name] = TextColumn.concatenate(parts, json_encoded=name == "tags")
+        return result
@@ -0,0 +1,1327 @@
+# memory_index.py
+import numpy as np
+import logging
+import json
+import os
+import threading
+import time
+from typing import Optional, Tuple, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# HNSW için opsiyonel bağımlılık
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def normalize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Satırları birim vektöre çevirir, sıfır normlu satırlar için False maskesi döner"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1)
+    valid = (norms > 0) & np.isfinite(norms)
+    normalized = np.zeros_like(matrix)
+    normalized[valid] = matrix[valid] / norms[valid, None]
+    return normalized, valid
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Skorları tam sıralamadan en yüksek k elemanın indekslerini (azalan) döner"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Bellek id'lerini satırlara eşleyen ortak indeks tabanı.
+
+    Satırlar yalnızca sona eklenir; silinen veya güncellenen kayıtlar
+    tombstone olarak işaretlenir ve ölü satırlar çoğaldığında sıkıştırılır.
+    Her satır, intent gibi kategorik etiketleri kod dizileri olarak, öncelik
+    veya tarih gibi sayısal değerleri float dizileri olarak taşıyabilir; arama
+    öncesi filtre maskeleri bu dizilerden vektörel olarak üretilir.
+
+    Bir EmbeddingSidecar bağlandığında vektörler kopyalanmaz: indeks satırları
+    sidecar kayıtlarıyla birebir eşleşir ve yazmalar önce sidecar'a eklenip
+    ardından sync() ile (diğer süreçlerin kayıtlarıyla birlikte) işlenir.
+    """
+
+    kind = "base"
+    compact_ratio = 0.5
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.lock = threading.RLock()
+        self.count = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.row_of: Dict[int, int] = {}
+        self.labels: Dict[str, np.ndarray] = {}
+        self.label_values: Dict[str, List[str]] = {}
+        self._label_codes: Dict[str, Dict[str, int]] = {}
+        self._partitions: Dict[Tuple[str, int], np.ndarray] = {}
+        self.values: Dict[str, np.ndarray] = {}
+        self.storage = None
+        self.unlabeled_ids: List[int] = []
+        # Anlık görüntüyle birlikte saklanan konum bilgisi (ör. günlük sırası)
+        self.checkpoint: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def params(self) -> Dict[str, Any]:
+        """Kalıcı kayıtta saklanacak indeks parametreleri"""
+        return {}
+
+    def _reserve(self, extra: int):
+        """Satır tamponlarını kapasiteyi ikiye katlayarak büyütür"""
+        needed = self.count + extra
+        if needed <= len(self.ids):
+            return
+        capacity = max(64, 2 * len(self.ids), needed)
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self.count] = self.ids[:self.count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        if self.storage is None:
+            vectors = np.empty((capacity, self.dim), dtype=np.float32)
+            vectors[:self.count] = self.vectors[:self.count]
+            self.vectors = vectors
+        self.ids, self.alive = ids, alive
+        for name, codes in self.labels.items():
+            grown = np.full(capacity, -1, dtype=np.int32)
+            grown[:self.count] = codes[:self.count]
+            self.labels[name] = grown
+        for name, column in self.values.items():
+            grown = np.full(capacity, np.nan, dtype=np.float64)
+            grown[:self.count] = column[:self.count]
+            self.values[name] = grown
+
+    def _encode_labels(self, name: str, values: List[str]) -> np.ndarray:
+        """Etiket değerlerini kategorik kodlara çevirir"""
+        if name not in self.labels:
+            self.labels[name] = np.full(len(self.ids), -1, dtype=np.int32)
+            self.label_values[name] = []
+            self._label_codes[name] = {}
+        codes = self._label_codes[name]
+        result = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            value = str(value)
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.label_values[name])
+                self.label_values[name].append(value)
+            result[i] = code
+        return result
+
+    def _invalidate_partitions(self, rows: np.ndarray):
+        """Değişen satırların ait olduğu bölüm önbelleklerini temizler"""
+        if not self._partitions:
+            return
+        for name, codes in self.labels.items():
+            for code in np.unique(codes[rows]).tolist():
+                self._partitions.pop((name, code), None)
+
+    def add(self, ids: List[int], vectors: np.ndarray, labels: Optional[Dict[str, List[str]]] = None,
+            values: Optional[Dict[str, List[float]]] = None) -> np.ndarray:
+        """Normalize edilmiş vektörleri ekler; var olan id'lerin eski satırı tombstone olur"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self.lock:
+            if self.storage is not None:
+                return self._add_to_storage(ids, vectors, labels, values)
+
+            replaced = [self.row_of[int(memory_id)] for memory_id in ids if int(memory_id) in self.row_of]
+            if replaced:
+                replaced = np.asarray(replaced, dtype=np.int64)
+                self.alive[replaced] = False
+                self._invalidate_partitions(replaced)
+                self._on_remove(replaced)
+
+            self._reserve(len(ids))
+            rows = np.arange(self.count, self.count + len(ids), dtype=np.int64)
+            self.ids[rows] = ids
+            self.alive[rows] = True
+            self.vectors[rows] = vectors
+            for name in self.labels:
+                self.labels[name][rows] = -1
+            for name, label_values in (labels or {}).items():
+                codes = self._encode_labels(name, label_values)
+                self.labels[name][rows] = codes
+            for name in self.values:
+                self.values[name][rows] = np.nan
+            for name, column in (values or {}).items():
+                self._value_column(name)[rows] = np.asarray(column, dtype=np.float64)
+            self.count += len(ids)
+            for row, memory_id in zip(rows, ids):
+                self.row_of[int(memory_id)] = int(row)
+            self._invalidate_partitions(rows)
+            self._on_add(rows, vectors)
+            self._maybe_compact()
+            return rows
+
+    def _add_to_storage(self, ids: List[int], vectors: np.ndarray, labels: Optional[Dict[str, List[str]]],
+                        values: Optional[Dict[str, List[float]]] = None) -> np.ndarray:
+        start = self.storage.append(ids, vectors)
+        self.sync()
+        rows = np.arange(start, start + len(ids), dtype=np.int64)
+        own = set(int(memory_id) for memory_id in ids)
+        self.unlabeled_ids = [memory_id for memory_id in self.unlabeled_ids if memory_id not in own]
+        for name, label_values in (labels or {}).items():
+            self.set_labels(ids, name, label_values)
+        for name, column in (values or {}).items():
+            self.set_values(ids, name, column)
+        return rows
+
+    def attach_storage(self, storage) -> List[int]:
+        """Vektörleri paylaşılan sidecar dosyasından okumaya başlar ve tüm kayıtları yükler"""
+        with self.lock:
+            self.storage = storage
+            self.count = 0
+            self.ids = np.empty(0, dtype=np.int64)
+            self.alive = np.empty(0, dtype=bool)
+            self.vectors = storage.matrix
+            self.row_of = {}
+            self.labels = {name: np.empty(0, dtype=np.int32) for name in self.labels}
+            self.values = {name: np.empty(0, dtype=np.float64) for name in self.values}
+            self._partitions = {}
+            self.unlabeled_ids = []
+            self._rebuild()
+            return self.sync()
+
+    def sync(self) -> List[int]:
+        """Sidecar'a eklenen yeni kayıtları indekse işler ve yeni canlı id'leri döner"""
+        with self.lock:
+            if self.storage is None:
+                return []
+            if self.storage.refresh():
+                # Dosya başka bir süreç tarafından sıkıştırıldı; satırlar yeniden numaralandı
+                logger.debug("Sidecar değişti, indeks baştan yükleniyor")
+                return self.attach_storage(self.storage)
+
+            start, end = self.count, self.storage.count
+            if end <= start:
+                return []
+            record_ids = np.asarray(self.storage.ids[start:end])
+            self._reserve(end - start)
+            self.vectors = self.storage.matrix
+            self.ids[start:end] = np.abs(record_ids)
+            self.alive[start:end] = False
+            for name in self.labels:
+                self.labels[name][start:end] = -1
+            for name in self.values:
+                self.values[name][start:end] = np.nan
+            self.count = end
+
+            # Aynı id için son kayıt geçerlidir; negatif id silme kaydıdır
+            old_rows = []
+            for offset, record_id in enumerate(record_ids.tolist()):
+                memory_id = abs(record_id)
+                old_row = self.row_of.pop(memory_id, None)
+                if old_row is not None:
+                    self.alive[old_row] = False
+                    if old_row < start:
+                        old_rows.append(old_row)
+                if record_id > 0:
+                    self.row_of[memory_id] = start + offset
+                    self.alive[start + offset] = True
+
+            if old_rows:
+                old_rows = np.asarray(old_rows, dtype=np.int64)
+                self._invalidate_partitions(old_rows)
+                self._on_remove(old_rows)
+            new_rows = start + np.flatnonzero(self.alive[start:end])
+            if len(new_rows):
+                self._invalidate_partitions(new_rows)
+                self._on_add(new_rows, self.vectors[new_rows])
+            new_ids = self.ids[new_rows].tolist()
+            self.unlabeled_ids.extend(new_ids)
+            self._maybe_compact()
+            return new_ids
+
+    def set_labels(self, ids: List[int], name: str, values: List[str]):
+        """Var olan satırların etiketlerini günceller"""
+        with self.lock:
+            pairs = [(self.row_of[int(memory_id)], value) for memory_id, value in zip(ids, values) if int(memory_id) in self.row_of]
+            if not pairs:
+                return
+            rows = np.asarray([row for row, _ in pairs], dtype=np.int64)
+            codes = self._encode_labels(name, [value for _, value in pairs])
+            self._invalidate_partitions(rows)
+            self.labels[name][rows] = codes
+            self._invalidate_partitions(rows)
+
+    def _value_column(self, name: str) -> np.ndarray:
+        if name not in self.values:
+            self.values[name] = np.full(len(self.ids), np.nan, dtype=np.float64)
+        return self.values[name]
+
+    def set_values(self, ids: List[int], name: str, values: List[float]):
+        """Var olan satırların sayısal değerlerini (ör. öncelik, zaman damgası) günceller"""
+        with self.lock:
+            pairs = [(self.row_of[int(memory_id)], value) for memory_id, value in zip(ids, values) if int(memory_id) in self.row_of]
+            if not pairs:
+                return
+            rows = np.asarray([row for row, _ in pairs], dtype=np.int64)
+            column = np.asarray([np.nan if value is None else value for _, value in pairs], dtype=np.float64)
+            self._value_column(name)[rows] = column
+
+    def bump_values(self, ids: List[int], name: str, delta: float = 1.0):
+        """Var olan satırların sayısal değerini artırır (tekrarlanan id'ler birikir)"""
+        with self.lock:
+            rows = [self.row_of[int(memory_id)] for memory_id in ids if int(memory_id) in self.row_of]
+            if rows:
+                rows = np.asarray(rows, dtype=np.int64)
+                column = self._value_column(name)
+                # Değeri olmayan (NaN) satırlar sıfırdan başlar
+                column[rows] = np.nan_to_num(column[rows])
+                np.add.at(column, rows, delta)
+
+    def filter_rows(self, labels: Optional[Dict[str, List[str]]] = None,
+                    ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> np.ndarray:
+        """Filtreleri sağlayan canlı satırlar.
+
+        labels: etiket adı -> izin verilen değerler; ranges: değer adı ->
+        (alt, üst) kapalı aralık, None sınırsız demektir. Değeri olmayan (NaN)
+        satırlar aralık filtresini geçemez. Maske tek geçişte vektörel kurulur.
+        """
+        with self.lock:
+            mask = self.alive[:self.count].copy()
+            for name, allowed in (labels or {}).items():
+                known = self._label_codes.get(name, {})
+                codes = [known[str(value)] for value in allowed if str(value) in known]
+                if not codes:
+                    return np.empty(0, dtype=np.int64)
+                mask &= np.isin(self.labels[name][:self.count], codes)
+            for name, (low, high) in (ranges or {}).items():
+                if name not in self.values:
+                    return np.empty(0, dtype=np.int64)
+                column = self.values[name][:self.count]
+                if low is not None:
+                    mask &= column >= low
+                if high is not None:
+                    mask &= column <= high
+            return np.flatnonzero(mask)
+
+    def label_rows(self, name: str, value: str) -> np.ndarray:
+        """Etiketi verilen değere eşit canlı satırlar (bölüm); önbelleğe alınır"""
+        with self.lock:
+            code = self._label_codes.get(name, {}).get(str(value))
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            rows = self._partitions.get((name, code))
+            if rows is None:
+                rows = np.flatnonzero((self.labels[name][:self.count] == code) & self.alive[:self.count])
+                self._partitions[(name, code)] = rows
+            return rows
+
+    def remove(self, ids: List[int]) -> int:
+        """Verilen id'leri tombstone olarak işaretler"""
+        with self.lock:
+            if self.storage is not None:
+                present = [int(memory_id) for memory_id in ids if int(memory_id) in self.row_of]
+                if present:
+                    self.storage.append_deletes(present)
+                    self.sync()
+                return len(present)
+
+            rows = [self.row_of.pop(int(memory_id)) for memory_id in ids if int(memory_id) in self.row_of]
+            if not rows:
+                return 0
+            rows = np.asarray(rows, dtype=np.int64)
+            self.alive[rows] = False
+            self._invalidate_partitions(rows)
+            self._on_remove(rows)
+            self._maybe_compact()
+            return len(rows)
+
+    def clear(self):
+        """İndeksi boşaltır"""
+        with self.lock:
+            if self.storage is not None:
+                self.storage.truncate()
+                self.attach_storage(self.storage)
+                return
+            self.count = 0
+            self.ids = self.ids[:0].copy()
+            self.alive = self.alive[:0].copy()
+            self.vectors = self.vectors[:0].copy()
+            self.row_of = {}
+            self.labels = {name: codes[:0].copy() for name, codes in self.labels.items()}
+            self.values = {name: column[:0].copy() for name, column in self.values.items()}
+            self._partitions = {}
+            self._rebuild()
+
+    def _maybe_compact(self):
+        dead = self.count - len(self.row_of)
+        if self.count >= 1024 and dead > self.count * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """Ölü satırları atarak tamponları yeniden oluşturur"""
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.count])
+            if self.storage is not None:
+                if not self.storage.compact(live, self.count):
+                    return
+                self.vectors = self.storage.matrix
+            else:
+                self.vectors = np.ascontiguousarray(self.vectors[live])
+            self.ids = self.ids[live].copy()
+            self.alive = np.ones(len(live), dtype=bool)
+            self.labels = {name: codes[live].copy() for name, codes in self.labels.items()}
+            self.values = {name: column[live].copy() for name, column in self.values.items()}
+            self._partitions = {}
+            self.count = len(live)
+            self.row_of = {int(memory_id): row for row, memory_id in enumerate(self.ids)}
+            self._rebuild()
+            logger.debug(f"{self.kind} indeksi sıkıştırıldı: {self.count} satır")
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray):
+        """Alt sınıfların yeni satırları kendi yapılarına eklemesi için kanca"""
+
+    def _on_remove(self, rows: np.ndarray):
+        """Alt sınıfların silinen satırları işaretlemesi için kanca"""
+
+    def _rebuild(self):
+        """Satır numaraları değiştiğinde alt sınıf yapılarının yeniden kurulması için kanca"""
+
+    def exact_scores(self, query: np.ndarray) -> np.ndarray:
+        """Tüm satırlar için kosinüs skorları; ölü satırlar -inf olur"""
+        scores = self.vectors[:self.count] @ query
+        scores[~self.alive[:self.count]] = -np.inf
+        return scores
+
+    def exact_search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Tüm satırlar üzerinde kaba kuvvet arama"""
+        with self.lock:
+            scores = self.exact_scores(query)
+            rows = top_k(scores, min(k, len(self.row_of)))
+            return self.ids[rows].copy(), scores[rows]
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorguya en yakın k belleğin id'lerini ve skorlarını döner"""
+        return self.exact_search(query, k)
+
+    def exact_search_batch(self, queries: np.ndarray, k: int = 1, chunk_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorgu matrisini parçalar halinde tek matris çarpımıyla tarar"""
+        with self.lock:
+            k = min(k, len(self.row_of))
+            ids = np.empty((len(queries), k), dtype=np.int64)
+            scores = np.empty((len(queries), k), dtype=np.float32)
+            if k <= 0:
+                return ids, scores
+            dead = ~self.alive[:self.count]
+            for start in range(0, len(queries), chunk_size):
+                block = queries[start:start + chunk_size] @ self.vectors[:self.count].T
+                block[:, dead] = -np.inf
+                if k < block.shape[1]:
+                    candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+                else:
+                    candidates = np.broadcast_to(np.arange(block.shape[1]), block.shape).copy()
+                candidate_scores = np.take_along_axis(block, candidates, axis=1)
+                order = np.argsort(-candidate_scores, axis=1, kind="stable")
+                rows = np.take_along_axis(candidates, order, axis=1)
+                ids[start:start + len(block)] = self.ids[rows]
+                scores[start:start + len(block)] = np.take_along_axis(candidate_scores, order, axis=1)
+            return ids, scores
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Her sorgu satırı için en yakın k id ve skoru (Q x k) döner"""
+        return self.exact_search_batch(queries, k)
+
+    def search_rows(self, query: np.ndarray, rows: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Yalnızca verilen satırlar (ör. bir intent bölümü) üzerinde tam arama"""
+        with self.lock:
+            if len(rows) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            scores = self.vectors[rows] @ query
+            best = top_k(scores, k)
+            return self.ids[rows[best]].copy(), scores[best]
+
+    def save(self, path: str, checkpoint: Optional[Dict[str, Any]] = None):
+        """İndeksi belirtilen önekle diske yazar; checkpoint meta bilgisine eklenir"""
+        with self.lock:
+            if checkpoint is not None:
+                self.checkpoint = dict(checkpoint)
+            meta = {"kind": self.kind, "dim": self.dim, "params": self.params(), "labels": self.label_values,
+                    "values": list(self.values), "storage": self.storage is not None, "checkpoint": self.checkpoint}
+            # Sidecar kullanılıyorsa vektörler kaydedilmez, yüklemede sidecar'dan eşlenir
+            vectors = self.vectors[:self.count] if self.storage is None else np.empty((0, self.dim), dtype=np.float32)
+            tmp_path = f"{path}.npz.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    ids=self.ids[:self.count],
+                    alive=self.alive[:self.count],
+                    vectors=vectors,
+                    meta=np.array(json.dumps(meta)),
+                    **{f"label_{name}": codes[:self.count] for name, codes in self.labels.items()},
+                    **{f"value_{name}": column[:self.count] for name, column in self.values.items()}
+                )
+            self._save_extra(path)
+            os.replace(tmp_path, f"{path}.npz")
+
+    def _save_extra(self, path: str):
+        """Alt sınıfların ek dosyalarını yazması için kanca"""
+
+    def _restore(self, path: str, ids: np.ndarray, alive: np.ndarray, vectors: np.ndarray,
+                 labels: Optional[Dict[str, Tuple[List[str], np.ndarray]]] = None, storage=None,
+                 checkpoint: Optional[Dict[str, Any]] = None, values: Optional[Dict[str, np.ndarray]] = None):
+        self.checkpoint = dict(checkpoint or {})
+        self.count = len(ids)
+        self.ids = ids.astype(np.int64)
+        self.alive = alive.astype(bool)
+        self.storage = storage
+        if storage is not None:
+            self.vectors = storage.matrix
+        else:
+            self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.row_of = {int(self.ids[row]): int(row) for row in np.flatnonzero(self.alive)}
+        for name, (label_values, codes) in (labels or {}).items():
+            self.labels[name] = codes.astype(np.int32)
+            self.label_values[name] = list(label_values)
+            self._label_codes[name] = {value: code for code, value in enumerate(label_values)}
+        for name, column in (values or {}).items():
+            self.values[name] = column.astype(np.float64)
+        self._load_extra(path)
+
+    def _load_extra(self, path: str):
+        """Alt sınıfların ek dosyalarını okuması için kanca; varsayılan yeniden kurar"""
+        self._rebuild()
+
+
+class Ranker:
+    """Kosinüs skorunu satır değerlerinden hesaplanan önsel puanlarla birleştirir.
+
+    puan = kosinüs + priority * (öncelik - 1) + usage * log(1 + kullanım)
+           + recency * 2^(-yaş / yarı_ömür)
+
+    Yaş, son kullanımdan (hiç kullanılmadıysa oluşturulmadan) beri geçen
+    süredir. Ağırlıkların hepsi sıfırsa sıralama değişmez. Önsel puanlar
+    kosinüse göre en iyi ``candidates`` aday için tek seferde hesaplanır.
+    """
+
+    def __init__(self, priority: float = 0.0, usage: float = 0.0, recency: float = 0.0,
+                 half_life_days: float = 30.0, candidates: int = 50):
+        self.priority = float(priority)
+        self.usage = float(usage)
+        self.recency = float(recency)
+        self.half_life = max(float(half_life_days), 1e-6) * 86400.0
+        self.candidates = int(candidates)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.priority or self.usage or self.recency)
+
+    def prior(self, index: VectorIndex, rows: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """Verilen satırların önsel puanları; değeri olmayan sinyaller katkı vermez"""
+        prior = np.zeros(len(rows), dtype=np.float64)
+
+        def column(name: str) -> np.ndarray:
+            values = index.values.get(name)
+            return values[rows] if values is not None else np.full(len(rows), np.nan)
+
+        if self.priority:
+            prior += self.priority * np.nan_to_num(column("priority") - 1.0)
+        if self.usage:
+            prior += self.usage * np.log1p(np.maximum(np.nan_to_num(column("usage_count")), 0.0))
+        if self.recency:
+            now = time.time() if now is None else now
+            age = np.maximum(now - np.fmax(column("last_used"), column("created_at")), 0.0)
+            prior += self.recency * np.nan_to_num(np.exp2(-age / self.half_life))
+        return prior
+
+    def rank(self, index: VectorIndex, ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Adayları birleşik puana göre sıralar; (id, kosinüs, birleşik puan) döner"""
+        if not self.enabled or len(ids) == 0:
+            return ids[:k], scores[:k], scores[:k]
+        with index.lock:
+            rows = np.fromiter((index.row_of.get(int(memory_id), -1) for memory_id in ids), dtype=np.int64, count=len(ids))
+            known = rows >= 0
+            ids, scores, rows = ids[known], scores[known], rows[known]
+            combined = scores + self.prior(index, rows)
+        order = np.argsort(-combined, kind="stable")[:k]
+        return ids[order], scores[order], combined[order]
+
+
+# uint8 değerleri için bit sayısı tablosu (np.bitwise_count olmayan numpy sürümleri için)
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """uint64 kelimelere paketlenmiş ikili kodlar ile sorgu kodu arasındaki Hamming uzaklıkları"""
+    xor = np.bitwise_xor(codes, query_code)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[xor.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def near_duplicate_pairs(matrix: np.ndarray, threshold: float = 0.95, bits: Optional[int] = None,
+                         tables: int = 16, max_bucket: int = 512, seed: int = 0,
+                         rows: Optional[np.ndarray] = None, chunk_size: int = 16384) -> np.ndarray:
+    """Kosinüs benzerliği eşiği aşan satır çiftlerini rastgele hiper düzlem LSH ile bulur.
+
+    Her tabloda satırlar ``bits`` adet rastgele hiper düzleme göre işaret koduna
+    ayrılır; yalnızca aynı kovaya düşen satırlar karşılaştırılır. Satırların
+    normalize olduğu varsayılır. ``max_bucket``'tan büyük kovalar sıralı parçalara
+    bölünür, böylece iş kayıt sayısıyla yaklaşık doğrusal kalır. rows verilirse
+    yalnızca matrix[rows] kullanılır ve konumlar rows içindedir. Matris (ör.
+    sidecar memmap'i) kopyalanmaz; kodlar ``chunk_size`` satırlık parçalarla
+    hesaplanır ve bellekte yalnızca satır başına bir kod tutulur. (i, j), i < j
+    çiftlerini döner.
+    """
+    if not isinstance(matrix, np.ndarray):
+        matrix = np.asarray(matrix, dtype=np.float32)
+    rows = np.arange(len(matrix), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+    count, dim = len(rows), matrix.shape[1]
+    if count < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    if bits is None:
+        # Rastgele dağılımda kova başına ~16 satır
+        bits = int(np.clip(np.round(np.log2(count / 16.0)), 4, 30))
+
+    def block_of(positions) -> np.ndarray:
+        return np.asarray(matrix[rows[positions]], dtype=np.float32)
+
+    chunks = [slice(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+    # Embedding'ler genelde ortak bir yöne yığılır; merkezlemek kovaları dengeler.
+    # (v - mean) @ planes > 0, v @ planes > mean @ planes ile aynıdır; merkezli kopya gerekmez
+    mean = (sum(block_of(chunk).sum(axis=0, dtype=np.float64) for chunk in chunks) / count).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    weights = np.left_shift(np.int64(1), np.arange(bits, dtype=np.int64))
+    codes = np.empty(count, dtype=np.int64)
+    found = []
+    for _ in range(tables):
+        planes = rng.standard_normal((dim, bits)).astype(np.float32)
+        offsets = mean @ planes
+        for chunk in chunks:
+            codes[chunk] = ((block_of(chunk) @ planes) > offsets).astype(np.int64) @ weights
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [count]))
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            for chunk_start in range(start, end, max_bucket):
+                members = order[chunk_start:min(chunk_start + max_bucket, end)]
+                if len(members) < 2:
+                    continue
+                block = block_of(members)
+                left, right = np.nonzero(np.triu(block @ block.T >= threshold, k=1))
+                if len(left):
+                    found.append(np.stack((members[left], members[right]), axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found)
+    pairs.sort(axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def connected_groups(count: int, pairs: np.ndarray) -> List[np.ndarray]:
+    """Çiftlerin birleştirdiği (birden fazla elemanlı) satır gruplarını döner"""
+    parent = np.arange(count)
+
+    def find(row: int) -> int:
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    for left, right in pairs:
+        root_left, root_right = find(int(left)), find(int(right))
+        if root_left != root_right:
+            parent[max(root_left, root_right)] = min(root_left, root_right)
+    members = np.unique(pairs)
+    roots = np.array([find(int(row)) for row in members], dtype=np.int64)
+    order = np.argsort(roots, kind="stable")
+    members, roots = members[order], roots[order]
+    bounds = np.flatnonzero(np.diff(roots)) + 1
+    return [group for group in np.split(members, bounds) if len(group) > 1]
+
+
+class Projection:
+    """Aday üretimi için çevrimdışı uydurulmuş PCA izdüşümü.
+
+    Normalize vektörler ``(v - mean) @ components.T`` ile küçük boyuta indirilir.
+    Kosinüs skoru ``z_v · z_q + v · mean`` ile yaklaşıklanır (sorguya bağlı sabit
+    terimler sıralamayı değiştirmez). Her yeniden uydurmada sürüm artar.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, version: int = 1):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.version = int(version)
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Vektörleri izdüşüm uzayına taşır"""
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def bias(self, vectors: np.ndarray) -> np.ndarray:
+        """İzdüşümde kaybolan ortalama yönündeki skor katkısı"""
+        return np.asarray(vectors, dtype=np.float32) @ self.mean
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dims: int = 128, version: int = 1, sample_size: int = 50000) -> "Projection":
+        """Verilen (normalize) vektörlerin bir örneği üzerinde PCA uydurur"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > sample_size:
+            sample = vectors[np.sort(np.random.default_rng(0).choice(len(vectors), sample_size, replace=False))]
+        else:
+            sample = vectors
+        mean = sample.mean(axis=0)
+        _, _, components = np.linalg.svd(sample - mean, full_matrices=False)
+        return cls(mean, components[:min(dims, len(components))], version)
+
+    def save(self, path: str):
+        """İzdüşümü atomik olarak diske yazar"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, version=np.int64(self.version))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Projection"]:
+        """Kayıtlı izdüşümü okur, yoksa veya bozuksa None döner"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["mean"], data["components"], int(data["version"]))
+        except Exception as e:
+            logger.error(f"İzdüşüm yükleme hatası: {str(e)}")
+            return None
+
+
+class ExactIndex(VectorIndex):
+    """Tam (kaba kuvvet) kosinüs araması.
+
+    İsteğe bağlı aday üretme aşamaları vardır; hepsinde seçilen adaylar
+    float32 vektörlerle (sidecar varsa eşlenmiş sayfalardan) yeniden skorlanır:
+
+    - ``quantization`` "int8": tarama bellekte tutulan satır başına ölçekli
+      int8 kopya üzerinde, önbellekte kalan küçük parçalar halinde yapılır; en
+      iyi ``rescore_k`` aday tutulur. RAM kazancı yalnızca float32 vektörler
+      sidecar'dan eşlendiğinde vardır, aksi halde kopya float32 matrise eklenir.
+    - ``prefilter`` "binary": her vektörün işaret bitleri (``hash_bits`` > 0
+      ise rastgele hiper düzlemler) uint64 kelimelere paketlenir; Hamming
+      uzaklığına göre en yakın ``prefilter_k`` aday tutulur.
+    - ``projection``: bir Projection dosyasının yolu. Tarama PCA ile
+      küçültülmüş matris üzerinde yapılır ve quantization yerine geçer. Dosya
+      başka bir süreçte yeniden uydurulursa (sürüm değişirse) bir sonraki
+      aramada tüm satırlar yeni izdüşümle yeniden kodlanır.
+    """
+
+    kind = "exact"
+    scan_chunk_size = 4096
+    # int8 parçaları float32 tampona açılarak çarpılır; tampon L2 önbellekte kalacak kadar küçük
+    quantized_chunk_size = 256
+
+    def __init__(self, dim: int, quantization: Optional[str] = None, rescore_k: int = 64,
+                 prefilter: Optional[str] = None, prefilter_k: int = 1024, hash_bits: int = 0,
+                 projection: Optional[str] = None):
+        super().__init__(dim)
+        if quantization not in (None, "none", "int8"):
+            # float16 NumPy'da BLAS'sız çarpıldığından float32'den yavaştı, desteklenmiyor
+            logger.warning(f"Desteklenmeyen quantization '{quantization}', float32 kullanılıyor")
+            quantization = None
+        if prefilter not in (None, "none", "binary"):
+            logger.warning(f"Bilinmeyen prefilter '{prefilter}', ön filtre kapalı")
+            prefilter = None
+        self.quantization = None if quantization == "none" else quantization
+        self.rescore_k = int(rescore_k)
+        self.prefilter = None if prefilter == "none" else prefilter
+        self.prefilter_k = int(prefilter_k)
+        self.hash_bits = int(hash_bits)
+        self.projection_path = None if projection in (None, "none") else projection
+        self._projection: Optional[Projection] = None
+        self._projection_stamp = None
+        self._reduced: Optional[np.ndarray] = None
+        self._bias: Optional[np.ndarray] = None
+        self._scan: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._planes: Optional[np.ndarray] = None
+        if self.prefilter and self.hash_bits:
+            # Kelime sınırına yuvarlanmış, sabit tohumlu rastgele hiper düzlemler
+            bits = 64 * int(np.ceil(self.hash_bits / 64))
+            self._planes = np.random.default_rng(0).standard_normal((dim, bits)).astype(np.float32)
+        self._load_projection()
+        self._rebuild()
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "quantization": self.quantization,
+            "rescore_k": self.rescore_k,
+            "prefilter": self.prefilter,
+            "prefilter_k": self.prefilter_k,
+            "hash_bits": self.hash_bits,
+            "projection": self.projection_path,
+        }
+
+    @property
+    def projection_version(self) -> Optional[int]:
+        return self._projection.version if self._projection is not None else None
+
+    def _has_stages(self) -> bool:
+        return bool(self.quantization or self.prefilter or self._projection is not None)
+
+    def _projection_file_stamp(self):
+        try:
+            stat = os.stat(self.projection_path)
+            return stat.st_mtime_ns, stat.st_ino
+        except OSError:
+            return None
+
+    def _load_projection(self):
+        """İzdüşüm dosyasını okur; boyutu uymuyorsa izdüşüm kullanılmaz"""
+        self._projection = None
+        self._projection_stamp = None
+        if not self.projection_path:
+            return
+        self._projection_stamp = self._projection_file_stamp()
+        projection = Projection.load(self.projection_path)
+        if projection is None:
+            return
+        if projection.dim != self.dim:
+            logger.warning(f"İzdüşüm boyutu ({projection.dim}) indeksle ({self.dim}) uyuşmuyor, kullanılmıyor")
+            return
+        self._projection = projection
+        logger.debug(f"PCA izdüşümü yüklendi: sürüm {projection.version}, {self.dim} -> {projection.dims}")
+
+    def _check_projection(self):
+        """İzdüşüm dosyası değiştiyse yükleyip tüm satırları yeniden kodlar"""
+        if not self.projection_path or self._projection_file_stamp() == self._projection_stamp:
+            return
+        previous = self.projection_version
+        self._load_projection()
+        if self.projection_version != previous:
+            self._rebuild()
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Satır başına ölçekli int8 kodlar üretir"""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """Vektörleri uint64 kelimelere paketlenmiş ikili kodlara çevirir"""
+        projected = vectors @ self._planes if self._planes is not None else vectors
+        bits = projected > 0
+        padding = (-bits.shape[1]) % 64
+        if padding:
+            bits = np.pad(bits, ((0, 0), (0, padding)))
+        return np.ascontiguousarray(np.packbits(bits, axis=1)).view(np.uint64)
+
+    def _grow(self, array: Optional[np.ndarray], size: int, shape: Tuple[int, ...], dtype, fill=0) -> np.ndarray:
+        if array is not None and size <= len(array):
+            return array
+        capacity = max(64, size, 2 * (len(array) if array is not None else 0))
+        grown = np.full((capacity,) + shape, fill, dtype=dtype)
+        if array is not None:
+            grown[:len(array)] = array
+        return grown
+
+    def _reserve_stages(self, size: int):
+        if self._projection is not None:
+            self._reduced = self._grow(self._reduced, size, (self._projection.dims,), np.float32)
+            self._bias = self._grow(self._bias, size, (), np.float32)
+        elif self.quantization:
+            self._scan = self._grow(self._scan, size, (self.dim,), np.int8)
+            self._scales = self._grow(self._scales, size, (), np.float32, 1.0)
+        if self.prefilter:
+            words = (self._planes.shape[1] if self._planes is not None else self.dim + 63) // 64
+            self._codes = self._grow(self._codes, size, (words,), np.uint64)
+
+    def _encode_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        """Aday aşamalarının kopyalarını verilen satırlar için günceller"""
+        if self._projection is not None:
+            self._reduced[rows] = self._projection.transform(vectors)
+            self._bias[rows] = self._projection.bias(vectors)
+        elif self.quantization:
+            codes, scales = self._quantize(vectors)
+            self._scan[rows] = codes
+            self._scales[rows] = scales
+        if self.prefilter:
+            self._codes[rows] = self._hash(vectors)
+
+    def _rebuild(self):
+        self._scan = self._scales = self._codes = self._reduced = self._bias = None
+        if not self._has_stages():
+            return
+        self._reserve_stages(self.count)
+        for start in range(0, self.count, self.scan_chunk_size):
+            end = min(start + self.scan_chunk_size, self.count)
+            self._encode_rows(np.arange(start, end), np.asarray(self.vectors[start:end]))
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray):
+        if not self._has_stages():
+            return
+        self._reserve_stages(self.count)
+        self._encode_rows(rows, np.asarray(vectors, dtype=np.float32))
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Küçültülmüş kopya üzerinde (Q, count) yaklaşık skorlar; ölü satırlar -inf"""
+        scores = np.empty((len(queries), self.count), dtype=np.float32)
+        if self._projection is not None:
+            reduced = self._projection.transform(queries)
+            for start in range(0, self.count, self.scan_chunk_size):
+                end = min(start + self.scan_chunk_size, self.count)
+                block = self._reduced[start:end] @ reduced.T
+                block += self._bias[start:end, None]
+                scores[:, start:end] = block.T
+            scores[:, ~self.alive[:self.count]] = -np.inf
+            return scores
+        # Her parça için yeni dizi ayırmak yerine aynı tamponlar yeniden kullanılır
+        chunk_size = self.quantized_chunk_size
+        buffer = np.empty((chunk_size, self.dim), dtype=np.float32)
+        block = np.empty((chunk_size, len(queries)), dtype=np.float32)
+        for start in range(0, self.count, chunk_size):
+            end = min(start + chunk_size, self.count)
+            rows = end - start
+            np.copyto(buffer[:rows], self._scan[start:end], casting="unsafe")
+            np.matmul(buffer[:rows], queries.T, out=block[:rows])
+            block[:rows] *= self._scales[start:end, None]
+            scores[:, start:end] = block[:rows].T
+        scores[:, ~self.alive[:self.count]] = -np.inf
+        return scores
+
+    def _binary_candidates(self, query: np.ndarray) -> np.ndarray:
+        """Hamming uzaklığı en küçük prefilter_k canlı satır"""
+        distances = hamming_distances(self._codes[:self.count], self._hash(query[None, :])[0])
+        distances[~self.alive[:self.count]] = np.iinfo(np.int32).max
+        candidates = top_k(-distances.astype(np.float32), self.prefilter_k)
+        return candidates[self.alive[candidates]]
+
+    def _rescore(self, query: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Aday satırları float32 vektörlerle yeniden skorlar"""
+        scores = np.asarray(self.vectors[candidates]) @ query
+        best = top_k(scores, k)
+        return self.ids[candidates[best]].copy(), scores[best]
+
+    def _candidate_search(self, queries: np.ndarray, k: int, chunk_size: int = 16) -> Tuple[np.ndarray, np.ndarray]:
+        """Aday aşamasıyla seçilen satırları her sorgu için yeniden skorlar"""
+        k = min(k, len(self.row_of))
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if k <= 0:
+            return ids, scores
+        for start in range(0, len(queries), chunk_size):
+            block = queries[start:start + chunk_size]
+            approximate = self._approximate_scores(block) if not self.prefilter else None
+            for offset, query in enumerate(block):
+                if self.prefilter:
+                    candidates = self._binary_candidates(query)
+                else:
+                    candidates = top_k(approximate[offset], max(k, self.rescore_k))
+                    candidates = candidates[np.isfinite(approximate[offset][candidates])]
+                row_ids, row_scores = self._rescore(query, candidates, k)
+                ids[start + offset, :len(row_ids)] = row_ids
+                scores[start + offset, :len(row_ids)] = row_scores
+        return ids, scores
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            self._check_projection()
+            if not self._has_stages():
+                return self.exact_search(query, k)
+            ids, scores = self._candidate_search(query[None, :], k)
+            found = ids[0] >= 0
+            return ids[0][found], scores[0][found]
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            self._check_projection()
+            if not self._has_stages():
+                return self.exact_search_batch(queries, k)
+            return self._candidate_search(queries, k)
+
+
+class HNSWIndex(VectorIndex):
+    """hnswlib tabanlı yaklaşık en yakın komşu grafiği"""
+
+    kind = "hnsw"
+    compact_ratio = 0.3
+
+    def __init__(self, dim: int, M: int = 16, ef_construction: int = 200, ef: int = 64):
+        super().__init__(dim)
+        self.M = int(M)
+        self.ef_construction = int(ef_construction)
+        self.ef = int(ef)
+        self._graph = None
+        self._rebuild()
+
+    def params(self) -> Dict[str, Any]:
+        return {"M": self.M, "ef_construction": self.ef_construction, "ef": self.ef}
+
+    def _new_graph(self, max_elements: int):
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        graph.init_index(max_elements=max(1024, max_elements), ef_construction=self.ef_construction, M=self.M)
+        graph.set_ef(self.ef)
+        return graph
+
+    def _rebuild(self):
+        self._graph = self._new_graph(2 * self.count)
+        if self.count:
+            live = np.flatnonzero(self.alive[:self.count])
+            if len(live):
+                self._graph.add_items(self.vectors[live], live)
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray):
+        if self.count > self._graph.get_max_elements():
+            self._graph.resize_index(max(self.count, 2 * self._graph.get_max_elements()))
+        self._graph.add_items(vectors, rows)
+
+    def _on_remove(self, rows: np.ndarray):
+        for row in rows:
+            self._graph.mark_deleted(int(row))
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            k = min(k, len(self.row_of))
+            if k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            self._graph.set_ef(max(self.ef, k))
+            try:
+                labels, distances = self._graph.knn_query(query[None, :], k=k)
+            except RuntimeError as e:
+                logger.warning(f"HNSW araması başarısız, tam aramaya geçiliyor: {str(e)}")
+                return self.exact_search(query, k)
+            rows = labels[0].astype(np.int64)
+            return self.ids[rows].copy(), (1.0 - distances[0]).astype(np.float32)
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            k = min(k, len(self.row_of))
+            if k <= 0:
+                return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+            self._graph.set_ef(max(self.ef, k))
+            try:
+                labels, distances = self._graph.knn_query(queries, k=k)
+            except RuntimeError as e:
+                logger.warning(f"HNSW toplu araması başarısız, tam aramaya geçiliyor: {str(e)}")
+                return self.exact_search_batch(queries, k)
+            return self.ids[labels.astype(np.int64)], (1.0 - distances).astype(np.float32)
+
+    def _save_extra(self, path: str):
+        self._graph.save_index(f"{path}.hnsw")
+
+    def _load_extra(self, path: str):
+        graph_path = f"{path}.hnsw"
+        if not os.path.exists(graph_path):
+            self._rebuild()
+            return
+        self._graph = hnswlib.Index(space="ip", dim=self.dim)
+        self._graph.load_index(graph_path, max_elements=max(1024, 2 * self.count))
+        self._graph.set_ef(self.ef)
+
+
+class IVFIndex(VectorIndex):
+    """k-means merkezleriyle bölünmüş ters dosya (IVF) indeksi.
+
+    Her satır en yakın merkezin listesine eklenir; arama yalnızca sorguya
+    en yakın ``nprobe`` listeyi tarar. Liste boyutları kaydığında merkezler
+    arka planda yeniden eğitilir.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int, nlist: int = 0, nprobe: int = 8, min_train_size: int = 1000,
+                 drift_ratio: float = 4.0, train_iterations: int = 10, sample_size: int = 50000):
+        super().__init__(dim)
+        self.nlist = int(nlist)
+        self.nprobe = int(nprobe)
+        self.min_train_size = int(min_train_size)
+        self.drift_ratio = float(drift_ratio)
+        self.train_iterations = int(train_iterations)
+        self.sample_size = int(sample_size)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_cache: Dict[int, np.ndarray] = {}
+        self._trained_size = 0
+        self._generation = 0
+        self._training_thread: Optional[threading.Thread] = None
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "min_train_size": self.min_train_size,
+            "drift_ratio": self.drift_ratio,
+            "train_iterations": self.train_iterations,
+            "sample_size": self.sample_size,
+        }
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Vektörleri parça parça en yakın merkeze atar"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            block = vectors[start:start + chunk_size]
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _kmeans(self, sample: np.ndarray, nlist: int) -> np.ndarray:
+        """Küresel k-means ile normalize merkezler üretir"""
+        rng = np.random.default_rng(0)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            labels = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # Boş kalan merkezleri rastgele örneklerle yeniden başlat
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+            centroids, _ = normalize_rows(sums)
+        return centroids
+
+    def _set_assignments(self, assignments: np.ndarray, nlist: int):
+        """Atamalardan posting listelerini kurar"""
+        self.assignments = np.full(max(len(self.ids), len(assignments)), -1, dtype=np.int32)
+        self.assignments[:len(assignments)] = assignments
+        self._lists = [[] for _ in range(nlist)]
+        live = np.flatnonzero(self.alive[:len(assignments)])
+        order = live[np.argsort(assignments[live], kind="stable")]
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        for list_id in range(nlist):
+            self._lists[list_id] = order[bounds[list_id]:bounds[list_id + 1]].tolist()
+        self._list_cache = {}
+
+    def train(self):
+        """Merkezleri canlı vektörlerden eğitir ve tüm satırları yeniden atar"""
+        with self.lock:
+            count = self.count
+            generation = self._generation
+            live = np.flatnonzero(self.alive[:count])
+            if len(live) < max(1, self.min_train_size):
+                return
+            rng = np.random.default_rng(len(live))
+            sample_rows = live if len(live) <= self.sample_size else rng.choice(live, size=self.sample_size, replace=False)
+            sample = self.vectors[sample_rows].copy()
+            vectors = self.vectors
+
+        # Eğitim ve atama kilit dışında yapılır; satırlar yalnızca sona eklendiği için güvenlidir
+        nlist = self.nlist or int(np.clip(4 * np.sqrt(len(live)), 1, len(sample)))
+        centroids = self._kmeans(sample, min(nlist, len(sample)))
+        assignments = self._assign(vectors[:count], centroids)
+
+        with self.lock:
+            if generation != self._generation:
+                # Eğitim sırasında satırlar yeniden numaralandı
+                assignments = self._assign(self.vectors[:self.count], centroids)
+            elif self.count > count:
+                extra = self._assign(self.vectors[count:self.count], centroids)
+                assignments = np.concatenate([assignments, extra])
+            self.centroids = centroids
+            self._set_assignments(assignments, len(centroids))
+            self._trained_size = len(self.row_of)
+            logger.debug(f"IVF indeksi eğitildi: {len(centroids)} liste, {self._trained_size} kayıt")
+
+    def _needs_training(self) -> bool:
+        live = len(self.row_of)
+        if not self.is_trained:
+            return live >= self.min_train_size
+        if live > 2 * self._trained_size:
+            return True
+        # En büyük liste ortalamanın çok üstüne çıktıysa merkezler kaymıştır
+        sizes = np.fromiter((len(rows) for rows in self._lists), dtype=np.int64, count=len(self._lists))
+        return sizes.max() > self.drift_ratio * max(1.0, sizes.mean())
+
+    def _schedule_training(self):
+        """Gerekiyorsa merkezleri arka planda yeniden eğitir"""
+        if self._training_thread is not None and self._training_thread.is_alive():
+            return
+        if not self._needs_training():
+            return
+        self._training_thread = threading.Thread(target=self._train_safely, daemon=True)
+        self._training_thread.start()
+
+    def _train_safely(self):
+        try:
+            self.train()
+        except Exception as e:
+            logger.error(f"IVF eğitim hatası: {str(e)}")
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray):
+        if self.is_trained:
+            if len(self.assignments) < len(self.ids):
+                assignments = np.full(len(self.ids), -1, dtype=np.int32)
+                assignments[:len(self.assignments)] = self.assignments
+                self.assignments = assignments
+            labels = self._assign(vectors, self.centroids)
+            self.assignments[rows] = labels
+            for row, list_id in zip(rows.tolist(), labels.tolist()):
+                self._lists[list_id].append(row)
+                self._list_cache.pop(list_id, None)
+        self._schedule_training()
+
+    def _on_remove(self, rows: np.ndarray):
+        # Posting listelerindeki ölü satırlar arama sırasında alive maskesiyle elenir
+        if self.is_trained:
+            for list_id in np.unique(self.assignments[rows]).tolist():
+                self._list_cache.pop(list_id, None)
+
+    def _rebuild(self):
+        self._generation += 1
+        if self.is_trained:
+            self._set_assignments(self._assign(self.vectors[:self.count], self.centroids), len(self.centroids))
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_cache.get(list_id)
+        if rows is None:
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            rows = rows[self.alive[rows]]
+            self._lists[list_id] = rows.tolist()
+            self._list_cache[list_id] = rows
+        return rows
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            if not self.is_trained:
+                return self.exact_search(query, k)
+            probes = top_k(self.centroids @ query, self.nprobe)
+            rows = np.concatenate([self._list_rows(int(list_id)) for list_id in probes])
+            if len(rows) == 0:
+                return self.exact_search(query, k)
+            scores = self.vectors[rows] @ query
+            best = top_k(scores, k)
+            return self.ids[rows[best]].copy(), scores[best]
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            if not self.is_trained:
+                return self.exact_search_batch(queries, k)
+            k = min(k, len(self.row_of))
+            ids = np.full((len(queries), k), -1, dtype=np.int64)
+            scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+            # Merkez skorları tüm sorgular için tek çarpımla hesaplanır
+            probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+            for i, query in enumerate(queries):
+                rows = np.concatenate([self._list_rows(int(list_id)) for list_id in probes[i]])
+                if len(rows) == 0:
+                    continue
+                row_scores = self.vectors[rows] @ query
+                best = top_k(row_scores, k)
+                ids[i, :len(best)] = self.ids[rows[best]]
+                scores[i, :len(best)] = row_scores[best]
+            return ids, scores
+
+    def _save_extra(self, path: str):
+        if not self.is_trained:
+            return
+        tmp_path = f"{path}.ivf.npz.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments[:self.count])
+        os.replace(tmp_path, f"{path}.ivf.npz")
+
+    def _load_extra(self, path: str):
+        ivf_path = f"{path}.ivf.npz"
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as data:
+                if len(data["assignments"]) == self.count:
+                    self.centroids = data["centroids"]
+                    self._set_assignments(data["assignments"], len(self.centroids))
+                    self._trained_size = len(self.row_of)
+                    return
+        self._schedule_training()
+
+
+INDEX_TYPES = {
+    "exact": ExactIndex,
+    "hnsw": HNSWIndex,
+    "ivf": IVFIndex,
+}
+
+
+def _resolve_index_type(kind: str):
+    if kind not in INDEX_TYPES:
+        logger.warning(f"Bilinmeyen indeks tipi '{kind}', tam aramaya geçiliyor")
+        return ExactIndex
+    if kind == "hnsw" and hnswlib is None:
+        logger.warning("hnswlib yüklü değil, tam aramaya geçiliyor")
+        return ExactIndex
+    return INDEX_TYPES[kind]
+
+
+def create_index(kind: str, dim: int, **params) -> VectorIndex:
+    """İstenen tipte boş bir indeks oluşturur"""
+    index_class = _resolve_index_type(kind)
+    if index_class.kind != kind:
+        # Geri dönüş durumunda diğer tipin parametreleri uygulanmaz
+        return index_class(dim)
+    return index_class(dim, **params)
+
+
+def read_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """Kayıtlı indeksin checkpoint bilgisini vektörleri okumadan döner"""
+    data_path = f"{path}.npz"
+    if not os.path.exists(data_path):
+        return None
+    try:
+        with np.load(data_path) as data:
+            return json.loads(str(data["meta"])).get("checkpoint", {})
+    except Exception as e:
+        logger.error(f"İndeks checkpoint okuma hatası: {str(e)}")
+        return None
+
+
+def load_index(path: str, storage=None) -> Optional[VectorIndex]:
+    """Diske yazılmış indeksi yükler, yoksa veya bozuksa None döner.
+
+    Sidecar ile kaydedilmiş indeks yalnızca aynı sidecar ile yüklenebilir;
+    kayıtlı satırların id'leri sidecar'ın ilk satırlarıyla birebir uyuşmalıdır.
+    Sonradan eklenen kayıtlar sync() ile işlenir.
+    """
+    data_path = f"{path}.npz"
+    if not os.path.exists(data_path):
+        return None
+    try:
+        with np.load(data_path) as data:
+            meta = json.loads(str(data["meta"]))
+            index = create_index(meta["kind"], meta["dim"], **meta.get("params", {}))
+            if index.kind != meta["kind"]:
+                return None
+            if meta.get("storage", False) != (storage is not None):
+                return None
+            if storage is not None:
+                count = len(data["ids"])
+                if storage.dim != meta["dim"] or storage.count < count:
+                    return None
+                if not np.array_equal(np.abs(storage.ids[:count]), data["ids"]):
+                    return None
+            labels = {
+                name: (values, data[f"label_{name}"])
+                for name, values in meta.get("labels", {}).items()
+                if f"label_{name}" in data
+            }
+            values = {name: data[f"value_{name}"] for name in meta.get("values", []) if f"value_{name}" in data}
+            index._restore(path, data["ids"], data["alive"], data["vectors"], labels, storage,
+                           meta.get("checkpoint"), values)
+        if storage is not None:
+            index.sync()
+        return index
+    except Exception as e:
+        logger.error(f"İndeks yükleme hatası: {str(e)}")
+        return None
@@ -0,0 +1,259 @@
+# memory_shards.py
+import hashlib
+import inspect
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Any, Iterator, Union
+
+from memory_sqlite import SQLiteMemoryManager, manager_params_from_settings
+
+logger = logging.getLogger(__name__)
+
+# Aktif kiracı; asyncio görevleri ve iş parçacıkları kendi değerini taşır
+_current_tenant: ContextVar[Optional[str]] = ContextVar("memory_tenant", default=None)
+SAFE_TENANT = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def create_memory_manager(settings: Dict[str, Any],
+                          **overrides) -> Union[SQLiteMemoryManager, "ShardedMemoryManager"]:
+    """Ayarlara göre uygulamanın bellek yöneticisini oluşturur; MEMORY_SHARDING açıksa yönlendirici döner"""
+    params = {**manager_params_from_settings(settings), **overrides}
+    sharding = settings.get("MEMORY_SHARDING") or {}
+    if sharding.get("enabled"):
+        return ShardedMemoryManager(base_dir=sharding.get("base_dir", "memory_shards"),
+                                    max_open=sharding.get("max_open", 16), **params)
+    return SQLiteMemoryManager(**params)
+
+
+@contextmanager
+def memory_manager(db: Optional[Any] = None, tenant: Optional[str] = None) -> Iterator[Any]:
+    """Verilen yöneticiyi, yoksa ayarlardan geçici bir yönetici oluşturup blok sonunda kapatır.
+
+    Parçalama açıksa tenant verilmişse o kiracının, verilmemişse bağlamdaki
+    kiracının parçası kullanılır.
+    """
+    owned = db is None
+    if owned:
+        from settings import settings
+        # Araçlar yalnızca SQL okur; indeks anlık görüntüsü gerekmedikçe yüklenmez
+        db = create_memory_manager(settings, preload_index=False)
+    try:
+        if tenant is not None and isinstance(db, ShardedMemoryManager):
+            with db.tenant(tenant):
+                yield db
+        else:
+            yield db
+    finally:
+        if owned:
+            db.close()
+
+
+class ShardedMemoryManager:
+    """Her kiracı (kullanıcı) için ayrı bir SQLite dosyası ve indeks tutan yönlendirici.
+
+    Parçalar ilk kullanımda açılır ve en fazla ``max_open`` tanesi açık tutulur;
+    en uzun süredir kullanılmayan parça kapatılır (kullanım tamponu yazılır,
+    indeks kaydedilir). O anda başka bir iş parçacığının kullandığı parça,
+    son kullanıcısı bırakınca kapatılır. SQLiteMemoryManager metotları etkin kiracının parçasına
+    yönlendirilir, böylece arama maliyeti yalnızca o kiracının verisine bağlıdır.
+    Etkin kiracı ``tenant()`` bloğu veya ``set_tenant()`` ile seçilir, seçilmemişse
+    ``default_tenant`` kullanılır.
+    """
+
+    def __init__(self, base_dir: str = "memory_shards", max_open: int = 16, default_tenant: str = "default",
+                 **manager_params):
+        self.base_dir = base_dir
+        self.max_open = max(int(max_open), 1)
+        self.default_tenant = default_tenant
+        self.manager_params = manager_params
+        self._shards: "OrderedDict[str, SQLiteMemoryManager]" = OrderedDict()
+        # Kullanımdaki parçaların sayaçları; LRU'dan düşen ama kullanımda olan parçalar kapanmayı bekler
+        self._refs: Dict[str, int] = {}
+        self._retired: Dict[str, SQLiteMemoryManager] = {}
+        # Kilit dışında açılmakta olan parçalar; aynı kiracıyı isteyenler bu olayı bekler
+        self._opening: Dict[str, threading.Event] = {}
+        self._lock = threading.RLock()
+        self._consolidation: Optional[Dict[str, Any]] = None
+        os.makedirs(base_dir, exist_ok=True)
+
+    def shard_path(self, tenant: str) -> str:
+        """Kiracının veritabanı yolu; dosya adına uygun olmayan adlar özetlenir"""
+        tenant = str(tenant)
+        name = tenant if SAFE_TENANT.match(tenant) else hashlib.sha1(tenant.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_dir, f"{name}.db")
+
+    @property
+    def current_tenant(self) -> str:
+        return _current_tenant.get() or self.default_tenant
+
+    def set_tenant(self, tenant: Optional[str]):
+        """Geçerli bağlamın (iş parçacığı / asyncio görevi) kiracısını ayarlar"""
+        _current_tenant.set(tenant)
+
+    @contextmanager
+    def tenant(self, tenant: str):
+        """Blok boyunca çağrıları verilen kiracının parçasına yönlendirir; parça blok boyunca açık kalır"""
+        token = _current_tenant.set(tenant)
+        try:
+            with self.checkout(tenant) as manager:
+                yield manager
+        finally:
+            _current_tenant.reset(token)
+
+    @contextmanager
+    def checkout(self, tenant: Optional[str] = None) -> Iterator[SQLiteMemoryManager]:
+        """Kiracının parçasını blok boyunca kullanımda işaretler; bu sürede LRU'dan düşse de kapatılmaz"""
+        tenant = str(tenant or self.current_tenant)
+        manager = self._acquire(tenant)
+        try:
+            yield manager
+        finally:
+            self._release(tenant)
+
+    def _acquire(self, tenant: str) -> SQLiteMemoryManager:
+        """Parçayı açar (gerekirse en eskisini LRU'dan düşürür) ve kullanım sayacını artırır.
+
+        Açılış (göçler, anlık görüntü yükleme veya indeks kurma) yönlendirici
+        kilidi dışında yapılır; aynı kiracıyı isteyen diğer çağrılar yalnızca o
+        açılışın bitmesini bekler.
+        """
+        while True:
+            with self._lock:
+                manager = self._shards.get(tenant)
+                if manager is None:
+                    manager = self._retired.pop(tenant, None)
+                if manager is not None:
+                    evicted = self._register(tenant, manager)
+                    break
+                opening = self._opening.get(tenant)
+                if opening is None:
+                    opening = self._opening[tenant] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                opening.wait()
+                continue
+            try:
+                manager = SQLiteMemoryManager(db_path=self.shard_path(tenant), **self.manager_params)
+                if self._consolidation:
+                    manager.start_consolidation(**self._consolidation)
+                with self._lock:
+                    evicted = self._register(tenant, manager)
+            finally:
+                with self._lock:
+                    self._opening.pop(tenant, None)
+                opening.set()
+            break
+        self._close_shards(evicted)
+        return manager
+
+    def _register(self, tenant: str, manager: SQLiteMemoryManager) -> List[tuple]:
+        """Kilit altında: parçayı en yeni yapar, sayacını artırır ve LRU'dan düşenleri döner"""
+        self._shards[tenant] = manager
+        self._shards.move_to_end(tenant)
+        self._refs[tenant] = self._refs.get(tenant, 0) + 1
+        evicted = []
+        while len(self._shards) > self.max_open:
+            name, old = self._shards.popitem(last=False)
+            if self._refs.get(name):
+                self._retired[name] = old
+            else:
+                evicted.append((name, old))
+        return evicted
+
+    def _release(self, tenant: str):
+        """Kullanım sayacını azaltır; LRU'dan düşmüş parçanın son kullanıcısıysa parçayı kapatır"""
+        with self._lock:
+            self._refs[tenant] -= 1
+            if self._refs[tenant]:
+                return
+            del self._refs[tenant]
+            manager = self._retired.pop(tenant, None)
+        if manager is not None:
+            self._close_shards([(tenant, manager)])
+
+    @staticmethod
+    def _close_shards(shards: List[tuple]):
+        # Kapatma disk yazdığı için kilit dışında yapılır
+        for name, manager in shards:
+            logger.debug(f"Bellek parçası kapatılıyor: {name}")
+            manager.close()
+
+    def open_tenants(self) -> List[str]:
+        """Açık parçaların kiracıları, en eskiden en yeniye"""
+        with self._lock:
+            return list(self._shards)
+
+    def tenants(self) -> List[str]:
+        """Diskte parçası olan kiracılar (özetlenmiş adlar özet olarak döner)"""
+        return sorted(name[:-3] for name in os.listdir(self.base_dir) if name.endswith(".db"))
+
+    @contextmanager
+    def _open_shards(self) -> Iterator[List[SQLiteMemoryManager]]:
+        """Açık parçaları blok boyunca kullanımda işaretleyerek döner"""
+        with self._lock:
+            tenants = list(self._shards)
+            for tenant in tenants:
+                self._refs[tenant] = self._refs.get(tenant, 0) + 1
+            managers = list(self._shards.values())
+        try:
+            yield managers
+        finally:
+            for tenant in tenants:
+                self._release(tenant)
+
+    def start_consolidation(self, interval: float, threshold: float = 0.95):
+        """Yakın tekrar birleştirmeyi açık ve sonradan açılacak tüm parçalarda başlatır"""
+        if interval <= 0:
+            return
+        self._consolidation = {"interval": interval, "threshold": threshold}
+        with self._open_shards() as managers:
+            for manager in managers:
+                manager.start_consolidation(interval, threshold=threshold)
+
+    def flush_usage_stats(self) -> int:
+        with self._open_shards() as managers:
+            return sum(manager.flush_usage_stats() for manager in managers)
+
+    def save_index(self):
+        with self._open_shards() as managers:
+            for manager in managers:
+                manager.save_index()
+
+    def close(self):
+        """Tüm açık ve kapanmayı bekleyen parçaları kapatır"""
+        with self._lock:
+            shards = list(self._shards.items()) + list(self._retired.items())
+            self._shards, self._retired = OrderedDict(), {}
+        self._close_shards(shards)
+
+    def __getattr__(self, name: str):
+        # Diğer tüm genel SQLiteMemoryManager API'si etkin kiracının parçasına gider;
+        # parça çağrı (üreteçlerde dolaşım) bitene kadar kullanımda sayılır
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attribute = getattr(SQLiteMemoryManager, name, None)
+        if not callable(attribute):
+            with self.checkout() as manager:
+                return getattr(manager, name)
+        generator = inspect.isgeneratorfunction(attribute)
+
+        def call(*args, **kwargs):
+            if generator:
+                return self._iterate(self.current_tenant, name, args, kwargs)
+            with self.checkout() as manager:
+                return getattr(manager, name)(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    def _iterate(self, tenant: str, name: str, args, kwargs) -> Iterator[Any]:
+        # Üreteç gövdesi ilk next() ile çalışır; parça dolaşım boyunca açık tutulur
+        with self.checkout(tenant) as manager:
+            yield from getattr(manager, name)(*args, **kwargs)
@@ -2,17 +2,197 @@
 import sqlite3
 import numpy as np
 import logging
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterable, Callable, Iterator
 import os
 from datetime import datetime
 import json
+import threading
+import hashlib
+import unicodedata
+import re
+import time
+import calendar
+import atexit
+import base64
+import gzip
+from contextlib import contextmanager
+from datetime import date, timezone
+from memory_index import (VectorIndex, Projection, Ranker, create_index, load_index, normalize_rows, read_checkpoint,
+                          near_duplicate_pairs, connected_groups)
+from embedding_sidecar import EmbeddingSidecar
+from memory_columns import MemoryColumns, MemoryColumnsBuilder
 
 # Debug logları için ayarlar
 logger = logging.getLogger(__name__)
 
+# İndekste filtreleme için satırlarla birlikte tutulan sütunlar ve varsayılanları
+INDEX_LABEL_COLUMNS = {"intent": "genel", "category": "genel", "emotion": "neutral"}
+INDEX_VALUE_COLUMNS = ("priority", "created_at", "usage_count", "last_used")
+# Aday başka bir süreçte silinmişse arama en fazla bu kadar kez tekrarlanır
+MISSING_RETRIES = 2
+# Kalıcı bağlantılara uygulanan varsayılan PRAGMA'lar (ayarlardan geçersiz kılınabilir)
+DEFAULT_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negatif değer KiB cinsinden
+    "busy_timeout": 5000,  # ms
+    "temp_store": "memory",
+}
+PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE = re.compile(r"^-?\w+$")
+# iter_memories() ile okunabilen sütunlar (embedding yalnızca açıkça istenirse)
+MEMORY_COLUMNS = ("id", "prompt", "response", "embedding", "tags", "priority", "intent", "context_message",
+                  "category", "emotion", "created_at", "usage_count", "last_used", "avg_match_score")
+# load_memory() ve dışa aktarmaların döndürdüğü alanlar
+LOAD_MEMORY_COLUMNS = ("id", "prompt", "response", "tags", "priority", "intent", "context_message",
+                       "category", "created_at", "usage_count", "last_used", "avg_match_score")
+# Kapasite sınırı ve çıkarma politikası; capacity 0 ise sınır yok,
+# priority_floor ve üstü öncelikli kayıtlar ile grace_seconds'tan yeni kayıtlar çıkarılmaz
+DEFAULT_RETENTION = {"capacity": 0, "policy": "lfu", "priority_floor": 3, "check_every": 100, "batch_size": 1000,
+                     "grace_seconds": 3600}
+# Hiç kullanılmamış kayıtların son kullanımı eklenme zamanı sayılır (NULL'lar en başa sıralanmasın);
+# ifadeler idx_memories_lfu/lru ifade indeksleriyle birebir aynı olmalı
+EVICTION_ORDER = {
+    "lfu": "usage_count ASC, COALESCE(last_used, created_at) ASC, id ASC",
+    "lru": "COALESCE(last_used, created_at) ASC, usage_count ASC, id ASC",
+}
+# add_memories() satırları; created_at verilmezse şimdiki zaman
+BULK_INSERT_SQL = """
+    INSERT INTO memories (prompt, response, embedding, tags, priority, intent, context_message, category, emotion,
+                          created_at, usage_count, last_used, avg_match_score, prompt_hash, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)
+"""
+# check_query_plans() ile indeks kullanımı doğrulanan sorgular: ad -> (sorgu, parametreler)
+QUERY_PLAN_CHECKS = {
+    "delete_by_intent": ("SELECT id FROM memories WHERE intent = ?", ("genel",)),
+    "get_all_memories": ("SELECT id, prompt, response, intent, created_at FROM memories ORDER BY created_at DESC", ()),
+    "created_range": ("SELECT id FROM memories WHERE created_at >= ? AND created_at < ?", ("1970-01-01", "9999-12-31")),
+    "recently_used": ("SELECT id FROM memories WHERE last_used >= ?", ("1970-01-01",)),
+    "category": ("SELECT id FROM memories WHERE category = ?", ("genel",)),
+    "add_memory": ("SELECT id FROM memories WHERE content_hash = ?", ("",)),
+    "iter_memories": ("SELECT id, prompt FROM memories WHERE id > ? AND intent = ? ORDER BY id LIMIT ?",
+                      (0, "genel", 1000)),
+    "iter_memories_newest": ("SELECT id, prompt FROM memories WHERE (created_at, id) < (?, ?) "
+                             "ORDER BY created_at DESC, id DESC LIMIT ?", ("9999", 0, 1000)),
+    "evict_lfu": (f"SELECT id FROM memories WHERE priority < ? AND created_at < ? ORDER BY {EVICTION_ORDER['lfu']} "
+                  "LIMIT ?", (3, "9999", 1000)),
+    "evict_lru": (f"SELECT id FROM memories WHERE priority < ? AND created_at < ? ORDER BY {EVICTION_ORDER['lru']} "
+                  "LIMIT ?", (3, "9999", 1000)),
+    "find_exact_response": ("SELECT id FROM memories WHERE prompt_hash = ? "
+                            "ORDER BY priority DESC, usage_count DESC, id DESC LIMIT 1", ("",)),
+}
+# Zaman damgaları Unix zamanı (UTC saniye) olarak okunur
+METADATA_SELECT = ("intent, category, emotion, priority, CAST(strftime('%s', created_at) AS REAL), "
+                   "usage_count, CAST(strftime('%s', last_used) AS REAL)")
+
+
+def to_timestamp(value: Any) -> Optional[float]:
+    """Tarih filtresini Unix zamanına çevirir; saat dilimi yoksa UTC kabul edilir"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return value.timestamp()
+        return float(calendar.timegm(value.timetuple()))
+    if isinstance(value, date):
+        return float(calendar.timegm(value.timetuple()))
+    raise ValueError(f"Geçersiz tarih: {value}")
+
+
+def to_db_timestamp(value: Any) -> Optional[str]:
+    """Tarihi SQLite CURRENT_TIMESTAMP biçimine (UTC) çevirir"""
+    timestamp = to_timestamp(value)
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def normalize_prompt(text: str) -> str:
+    """Birebir eşleşme için prompt'u normalize eder.
+
+    Türkçe büyük/küçük harf dönüşümü (İ -> i, I -> ı) uygulanır, noktalama
+    işaretleri atılır ve boşluklar tek boşluğa indirilir.
+    """
+    text = unicodedata.normalize("NFC", str(text)).replace("İ", "i").replace("I", "ı").lower()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+
+def prompt_hash(text: str) -> Optional[str]:
+    """Normalize edilmiş prompt'un özeti; boş kalan metinler için None"""
+    normalized = normalize_prompt(text)
+    if not normalized:
+        return None
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def content_hash(prompt: str, response: str) -> Optional[str]:
+    """Normalize prompt ve yanıt çiftinin özeti; aynı çiftin tekrar eklenmesini engeller"""
+    normalized = normalize_prompt(prompt)
+    if not normalized:
+        return None
+    payload = f"{normalized}\x1f{str(response).strip()}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def manager_params_from_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Uygulama ayarlarından SQLiteMemoryManager parametrelerini üretir.
+
+    Uygulama ve bakım betikleri aynı indeks, sidecar, PRAGMA ve saklama
+    yapılandırmasıyla çalışsın diye tek yerde toplanır.
+    """
+    index_type = settings.get("MEMORY_INDEX_TYPE", "exact")
+    return dict(
+        index_type=index_type,
+        index_params=settings.get("MEMORY_INDEX_PARAMS", {}).get(index_type, {}),
+        use_sidecar=settings.get("MEMORY_EMBEDDING_SIDECAR", True),
+        ranking=settings.get("MEMORY_RANKING"),
+        usage_flush_interval=settings.get("MEMORY_USAGE_FLUSH_INTERVAL", 5.0),
+        checkpoint_every=settings.get("MEMORY_CHECKPOINT_EVERY", 10000),
+        pragmas=settings.get("MEMORY_SQLITE_PRAGMAS"),
+        retention=settings.get("MEMORY_RETENTION")
+    )
+
+
 class SQLiteMemoryManager:
-    def __init__(self, db_path="memory.db"):
+    def __init__(self, db_path="memory.db", index_type: str = "exact", index_params: Optional[Dict[str, Any]] = None,
+                 similarity_threshold: float = 0.5, use_sidecar: bool = True,
+                 ranking: Optional[Dict[str, Any]] = None, usage_flush_interval: float = 0.0,
+                 pragmas: Optional[Dict[str, Any]] = None, cached_statements: int = 256,
+                 retention: Optional[Dict[str, Any]] = None, checkpoint_every: int = 10000,
+                 preload_index: bool = True):
         self.db_path = db_path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self.use_sidecar = use_sidecar
+        self.sidecar_path = f"{db_path}.vectors"
+        self.similarity_threshold = similarity_threshold
+        self.index_type = index_type
+        self.index_params = dict(index_params or {})
+        self.projection_path = f"{db_path}.pca.npz"
+        self.archive_path = f"{db_path}.archive.jsonl.gz"
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+        if self.retention["policy"] not in EVICTION_ORDER:
+            raise ValueError(f"Bilinmeyen çıkarma politikası: {self.retention['policy']}")
+        if index_type == "exact" and self.index_params.get("quantization") not in (None, "none") and not use_sidecar:
+            # Sidecar yoksa float32 matris bellekte kalır ve nicemlenmiş kopya RAM'i azaltmak yerine artırır
+            raise ValueError("quantization embedding sidecar'ı gerektirir (MEMORY_EMBEDDING_SIDECAR)")
+        if self.index_params.get("projection") == "pca":
+            # İzdüşüm fit_projection() ile veritabanının yanına yazılır
+            self.index_params["projection"] = self.projection_path
+        # Anlık görüntü yapılandırma başına ayrı dosyadadır; farklı ayarlarla açılan bir yönetici
+        # başka bir yapılandırmanın anlık görüntüsünün üzerine yazmaz
+        config = json.dumps({"type": index_type, "params": self.index_params}, sort_keys=True, default=str)
+        self.index_path = f"{db_path}.index.{hashlib.sha1(config.encode('utf-8')).hexdigest()[:10]}"
+        # Günlükte bu kadar değişiklik birikince anlık görüntü kaydedilir ve günlük budanır (0 = kapalı)
+        self.checkpoint_every = max(int(checkpoint_every or 0), 0)
+        # Kosinüse eklenen öncelik/kullanım/güncellik önselleri (ağırlıklar 0 ise kapalı)
+        self.ranker = Ranker(**(ranking or {}))
         logger.debug(f"Initializing SQLiteMemoryManager with db_path: {db_path}")
         
         # Duygu sözlüğü
@@ -46,52 +226,875 @@ class SQLiteMemoryManager:
             "emotion_timeline": []
         }
         
+        # Arama indeksi (ilk aramada yüklenir)
+        self._index_lock = threading.RLock()
+        self._index: Optional[VectorIndex] = None
+        self._index_loaded = False
+        self._sidecar: Optional[EmbeddingSidecar] = None
+        self._journal_seq = 0
+        # Son kaydedilen (veya yüklenen) anlık görüntünün günlük sırası
+        self._checkpoint_seq = 0
+
+        # Kullanım istatistikleri tamponu: id -> [eşleşme, skorlu eşleşme, skor toplamı, son kullanım]
+        # usage_flush_interval <= 0 ise her eşleşme hemen yazılır
+        self.usage_flush_interval = usage_flush_interval
+        self._usage_lock = threading.Lock()
+        self._usage_buffer: Dict[int, List[float]] = {}
+        self._usage_stop = threading.Event()
+        self._usage_thread: Optional[threading.Thread] = None
+        self._usage_atexit = False
+
+        # Yakın tekrar birleştirme işi (start_consolidation ile açılır)
+        self._consolidation_stop = threading.Event()
+        self._consolidation_thread: Optional[threading.Thread] = None
+
+        # Kapasite denetimi eklemeler biriktikçe yapılır; arşiv yazımları sıralanır
+        self._inserts_since_check = 0
+        self._archive_lock = threading.Lock()
+
+        # İş parçacığı başına kalıcı bağlantı havuzu: (sahip iş parçacığı, bağlantı)
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pool: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._pool_generation = 0
+        
         self._init_db()
+
+        # Anlık görüntü varsa indeksi hemen yükle; yalnızca sonraki günlük kayıtları uygulanır.
+        # Yalnızca SQL okuyan araçlar preload_index=False ile açar; indeks ilk aramada yüklenir
+        if preload_index and os.path.exists(f"{self.index_path}.npz"):
+            try:
+                self._ensure_index_loaded()
+            except Exception as e:
+                logger.error(f"İndeks anlık görüntüsü yüklenemedi: {str(e)}")
         
+    def _connect(self) -> sqlite3.Connection:
+        """Yeni bir bağlantı açar ve PRAGMA'ları uygular"""
+        busy_timeout = self.pragmas.get("busy_timeout") or 0
+        # Bağlantılar havuzda tutulur; her biri yalnızca kendi iş parçacığında kullanılır,
+        # close() hepsini kapatabilsin diye check_same_thread kapalı
+        conn = sqlite3.connect(self.db_path, timeout=float(busy_timeout) / 1000.0,
+                               cached_statements=self.cached_statements, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            if value is None:
+                continue
+            name = str(name).lower()
+            value = str(value)
+            if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(value):
+                logger.warning(f"Geçersiz PRAGMA atlandı: {name}={value}")
+                continue
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                logger.warning(f"PRAGMA {name} uygulanamadı: {str(e)}")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Çağıran iş parçacığının kalıcı bağlantısını döndürür, yoksa açar"""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or getattr(local, "generation", -1) != self._pool_generation:
+            conn = self._connect()
+            with self._pool_lock:
+                # Sonlanmış iş parçacıklarının bağlantıları kapatılır; havuz canlı iş parçacığı sayısıyla sınırlı kalır
+                stale = [entry for entry in self._pool if not entry[0].is_alive()]
+                self._pool = [entry for entry in self._pool if entry[0].is_alive()]
+                self._pool.append((threading.current_thread(), conn))
+                local.generation = self._pool_generation
+            local.conn = conn
+            local.depth = 0
+            for _, old in stale:
+                try:
+                    old.close()
+                except sqlite3.Error as e:
+                    logger.warning(f"Bağlantı kapatılamadı: {str(e)}")
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """İş parçacığının bağlantısıyla bir işlem açar; hata yoksa commit, varsa rollback yapar.
+
+        İç içe kullanılabilir: yalnızca en dıştaki blok commit/rollback eder.
+        """
+        conn = self._connection()
+        local = self._local
+        local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            local.depth -= 1
+            if local.depth == 0:
+                conn.rollback()
+            raise
+        local.depth -= 1
+        if local.depth == 0:
+            conn.commit()
+
+    def close_connections(self):
+        """Havuzdaki tüm bağlantıları kapatır; sonraki çağrılar yeni bağlantı açar"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+            self._pool_generation += 1
+        for _, conn in pool:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Bağlantı kapatılamadı: {str(e)}")
+
     def _init_db(self):
         logger.debug("Creating/checking database tables")
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS memories (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        prompt TEXT NOT NULL,
-                        response TEXT NOT NULL,
-                        embedding BLOB,
-                        tags TEXT,
-                        priority INTEGER DEFAULT 1,
-                        intent TEXT DEFAULT 'genel',
-                        context_message TEXT,
-                        category TEXT DEFAULT 'genel',
-                        emotion TEXT DEFAULT 'neutral',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        usage_count INTEGER DEFAULT 0,
-                        last_used TIMESTAMP,
-                        avg_match_score REAL DEFAULT 0
-                    )
-                ''')
-                
-                # Embedding sütunu var mı kontrol et
-                cursor.execute("PRAGMA table_info(memories)")
-                columns = [column[1] for column in cursor.fetchall()]
-                
-                if 'embedding' not in columns:
-                    cursor.execute('ALTER TABLE memories ADD COLUMN embedding BLOB')
-                
-                if 'emotion' not in columns:
-                    cursor.execute('ALTER TABLE memories ADD COLUMN emotion TEXT DEFAULT "neutral"')
-                
-                conn.commit()
-                logger.debug("Database tables created/checked successfully")
+            applied = self._migrate()
+            with self.transaction() as conn:
+                # FTS5 desteği yoksa göç tabloyu oluşturamaz; metin araması kapalı kalır
+                self.fts_enabled = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'").fetchone() is not None
+            if applied:
+                self.check_query_plans()
+            logger.debug("Database tables created/checked successfully")
         except Exception as e:
             logger.error(f"Error in _init_db: {str(e)}")
             raise
 
+    def _migrations(self) -> List[Tuple[int, Callable[[sqlite3.Cursor], None]]]:
+        """Sırasıyla uygulanan şema göçleri; sürüm PRAGMA user_version'da tutulur"""
+        return [
+            (1, self._migration_base_schema),
+            (2, self._migration_prompt_hash),
+            (3, self._migration_journal),
+            (4, self._migration_secondary_indexes),
+            (5, self._migration_content_hash),
+            (6, self._migration_eviction_indexes),
+            (7, self._migration_fts),
+        ]
+
+    def _migrate(self) -> List[int]:
+        """Bekleyen şema göçlerini her biri kendi işleminde uygular, uygulanan sürümleri döner.
+
+        Göçler eski (sürüm numarası olmayan) veritabanlarında da çalışabilecek
+        şekilde tekrarlanabilir yazılmıştır.
+        """
+        conn = self._connection()
+        applied = []
+        for version, migration in self._migrations():
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            # Aynı veritabanını açan diğer süreçlerle yarışmamak için yazma kilidi alınır
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                    migration(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {int(version)}")
+                    applied.append(version)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if applied:
+            logger.info(f"Şema göçleri uygulandı: {applied}")
+        return applied
+
+    def _migration_base_schema(self, cursor: sqlite3.Cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                tags TEXT,
+                priority INTEGER DEFAULT 1,
+                intent TEXT DEFAULT 'genel',
+                context_message TEXT,
+                category TEXT DEFAULT 'genel',
+                emotion TEXT DEFAULT 'neutral',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                usage_count INTEGER DEFAULT 0,
+                last_used TIMESTAMP,
+                avg_match_score REAL DEFAULT 0
+            )
+        ''')
+        
+        # Embedding sütunu var mı kontrol et
+        cursor.execute("PRAGMA table_info(memories)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'embedding' not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN embedding BLOB')
+        
+        if 'emotion' not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN emotion TEXT DEFAULT "neutral"')
+
+    def _migration_prompt_hash(self, cursor: sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(memories)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'prompt_hash' not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN prompt_hash TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_prompt_hash ON memories(prompt_hash)')
+
+        # Eski kayıtların prompt özetlerini doldur
+        cursor.execute("SELECT id, prompt FROM memories WHERE prompt_hash IS NULL")
+        pending = [(prompt_hash(prompt) or "", memory_id) for memory_id, prompt in cursor.fetchall()]
+        if pending:
+            cursor.executemany("UPDATE memories SET prompt_hash = ? WHERE id = ?", pending)
+            logger.info(f"{len(pending)} kaydın prompt özeti oluşturuldu")
+
+    def _migration_journal(self, cursor: sqlite3.Cursor):
+        # İndeks anlık görüntüsünden sonraki değişiklikler için günlük
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS memory_journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                memory_id INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_journal_insert AFTER INSERT ON memories
+            WHEN NEW.embedding IS NOT NULL
+            BEGIN
+                INSERT INTO memory_journal (op, memory_id) VALUES ('upsert', NEW.id);
+            END
+        ''')
+        cursor.execute("DROP TRIGGER IF EXISTS memories_journal_update")
+        cursor.execute('''
+            CREATE TRIGGER memories_journal_update
+            AFTER UPDATE OF embedding, intent, category, emotion, priority ON memories
+            BEGIN
+                INSERT INTO memory_journal (op, memory_id)
+                VALUES (CASE WHEN NEW.embedding IS NULL THEN 'delete' ELSE 'upsert' END, NEW.id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_journal_delete AFTER DELETE ON memories
+            BEGIN
+                INSERT INTO memory_journal (op, memory_id) VALUES ('delete', OLD.id);
+            END
+        ''')
+
+    def _migration_secondary_indexes(self, cursor: sqlite3.Cursor):
+        # intent/kategori filtreleri ve tarih sıralamaları tam tarama yapmasın
+        for column in ("intent", "created_at", "last_used", "category"):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_memories_{column} ON memories({column})")
+
+    def _migration_content_hash(self, cursor: sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(memories)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'content_hash' not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN content_hash TEXT')
+        cursor.execute("SELECT id, prompt, response FROM memories WHERE content_hash IS NULL")
+        pending = [(content_hash(prompt, response), memory_id) for memory_id, prompt, response in cursor.fetchall()]
+        cursor.executemany("UPDATE memories SET content_hash = ? WHERE id = ?", pending)
+        # Tekil indeks kurulmadan önce mevcut tekrarlar birleştirilir
+        merged = self._merge_duplicates(cursor)
+        if merged:
+            logger.info(f"{len(merged)} tekrar eden kayıt birleştirildi")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_content_hash ON memories(content_hash)")
+
+    def _migration_eviction_indexes(self, cursor: sqlite3.Cursor):
+        # Çıkarma adayları LFU/LRU sırasıyla indeksten okunur; sıra COALESCE(last_used, created_at)
+        # kullandığından indeksler ifade üzerine kurulur
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_lfu "
+                       "ON memories(usage_count, COALESCE(last_used, created_at))")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_lru "
+                       "ON memories(COALESCE(last_used, created_at), usage_count)")
+
+    @staticmethod
+    def _merge_duplicates(cursor: sqlite3.Cursor) -> List[int]:
+        """Aynı content_hash'e sahip kayıtları en eskisinde toplar, silinen ID'leri döner"""
+        cursor.execute("""
+            SELECT content_hash, MIN(id), SUM(usage_count), MAX(last_used)
+            FROM memories
+            WHERE content_hash IS NOT NULL
+            GROUP BY content_hash
+            HAVING COUNT(*) > 1
+        """)
+        groups = cursor.fetchall()
+        deleted = []
+        for digest, keep_id, usage_count, last_used in groups:
+            cursor.execute("SELECT id FROM memories WHERE content_hash = ? AND id != ?", (digest, keep_id))
+            deleted.extend(row[0] for row in cursor.fetchall())
+            cursor.execute("UPDATE memories SET usage_count = ?, last_used = ? WHERE id = ?",
+                           (usage_count or 0, last_used, keep_id))
+        cursor.executemany("DELETE FROM memories WHERE id = ?", [(memory_id,) for memory_id in deleted])
+        return deleted
+
+    def check_query_plans(self) -> Dict[str, str]:
+        """Yöneticinin sık kullanılan sorgularının EXPLAIN QUERY PLAN çıktısını döner.
+
+        İndeks kullanmayan (tam tarama yapan) sorgular için uyarı loglanır.
+        """
+        plans = {}
+        try:
+            with self.transaction() as conn:
+                for name, (query, params) in QUERY_PLAN_CHECKS.items():
+                    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+                    detail = "; ".join(str(row[-1]) for row in rows)
+                    plans[name] = detail
+                    if any(str(row[-1]).strip() == "SCAN memories" for row in rows):
+                        logger.warning(f"{name} sorgusu tam tarama yapıyor: {detail}")
+        except Exception as e:
+            logger.error(f"Sorgu planı kontrol hatası: {str(e)}")
+        return plans
+
+    def _migration_fts(self, cursor: sqlite3.Cursor):
+        """prompt ve response için tetikleyicilerle eşitlenen FTS5 tablosunu oluşturur.
+
+        SQLite FTS5 desteği olmadan derlenmişse tablo oluşturulmaz ve metin
+        araması kapalı kalır. Göç sürümlerinden önce açılışta oluşturulmuş
+        tablolar korunur.
+        """
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'")
+            exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+                    prompt, response,
+                    content='memories', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 kullanılamıyor, metin araması kapalı: {str(e)}")
+            return
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories
+            BEGIN
+                INSERT INTO memories_fts (rowid, prompt, response) VALUES (NEW.id, NEW.prompt, NEW.response);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories
+            BEGIN
+                INSERT INTO memories_fts (memories_fts, rowid, prompt, response)
+                VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_update AFTER UPDATE OF prompt, response ON memories
+            BEGIN
+                INSERT INTO memories_fts (memories_fts, rowid, prompt, response)
+                VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+                INSERT INTO memories_fts (rowid, prompt, response) VALUES (NEW.id, NEW.prompt, NEW.response);
+            END
+        ''')
+        if not exists:
+            # Var olan kayıtları dizine ekle
+            cursor.execute("INSERT INTO memories_fts (memories_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def _normalize_embedding(embedding: np.ndarray) -> Optional[np.ndarray]:
+        """Embedding'i float32 birim vektöre dönüştürür, sıfır normda None döner"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0 or not np.isfinite(norm):
+            return None
+        return vector / norm
+
+    def _db_embedding_state(self) -> Tuple[int, int]:
+        """Embedding'i olan kayıt sayısı ve en büyük id"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM memories WHERE embedding IS NOT NULL")
+            count, max_id = cursor.fetchone()
+        return count, max_id
+
+    @staticmethod
+    def _decode_embeddings(rows: List[Tuple], dim: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, List[Tuple]]:
+        """(id, blob, *metadata) satırlarını normalize edilmiş bir matrise çevirir.
+
+        dim verilmezse en sık görülen boyut kabul edilir; uyumsuz veya sıfır
+        normlu embedding'ler atlanır. Kalan satırların metadata kısmı da döner.
+        """
+        if dim is None:
+            sizes = {}
+            for row in rows:
+                sizes[len(row[1])] = sizes.get(len(row[1]), 0) + 1
+            dim = max(sizes, key=sizes.get) // 4 if sizes else 0
+        valid = [row for row in rows if len(row[1]) == dim * 4]
+        if len(valid) != len(rows):
+            logger.warning(f"{len(rows) - len(valid)} bellek uyumsuz embedding boyutu nedeniyle atlandı")
+        if not valid:
+            return np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32), []
+
+        matrix = np.frombuffer(b"".join(row[1] for row in valid), dtype=np.float32).reshape(len(valid), dim)
+        ids = np.fromiter((row[0] for row in valid), dtype=np.int64, count=len(valid))
+        matrix, keep = normalize_rows(matrix)
+        metadata = [row[2:] for row, ok in zip(valid, keep) if ok]
+        return ids[keep], matrix[keep], metadata
+
+    @staticmethod
+    def _split_metadata(metadata: List[Tuple]) -> Tuple[Dict[str, List[str]], Dict[str, List[float]]]:
+        """METADATA_SELECT sırasındaki değerleri indeks etiketlerine ve sayısal değerlerine ayırır"""
+        labels = {
+            name: [row[i] or default for row in metadata]
+            for i, (name, default) in enumerate(INDEX_LABEL_COLUMNS.items())
+        }
+        offset = len(INDEX_LABEL_COLUMNS)
+        values = {name: [row[offset + i] for row in metadata] for i, name in enumerate(INDEX_VALUE_COLUMNS)}
+        return labels, values
+
+    def _refresh_metadata(self, index: VectorIndex, memory_ids: List[int]):
+        """Verilen kayıtların filtre etiketlerini ve değerlerini tablodan yeniler"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(memory_ids), 500):
+                chunk = [int(memory_id) for memory_id in memory_ids[start:start + 500]]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(f"SELECT id, {METADATA_SELECT} FROM memories WHERE id IN ({placeholders})", chunk)
+                rows = cursor.fetchall()
+                self._set_metadata(index, [row[0] for row in rows], [row[1:] for row in rows])
+
+    def _set_metadata(self, index: VectorIndex, memory_ids: List[int], metadata: List[Tuple]):
+        labels, values = self._split_metadata(metadata)
+        for name, column in labels.items():
+            index.set_labels(memory_ids, name, column)
+        for name, column in values.items():
+            index.set_values(memory_ids, name, column)
+
+    def _new_index(self, dim: int) -> VectorIndex:
+        """Boş bir indeks oluşturur; sidecar açıksa vektörleri ona yazar"""
+        index = create_index(self.index_type, dim, **self.index_params)
+        if self.use_sidecar:
+            sidecar = EmbeddingSidecar(self.sidecar_path)
+            if not sidecar.open() or sidecar.dim != dim:
+                sidecar.create(dim)
+            index.attach_storage(sidecar)
+        return index
+
+    def _build_index_from_db(self) -> Optional[VectorIndex]:
+        """Tüm embedding'leri veritabanından okuyarak indeksi kurar"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, embedding, {METADATA_SELECT} FROM memories WHERE embedding IS NOT NULL")
+            rows = cursor.fetchall()
+
+        ids, matrix, metadata = self._decode_embeddings(rows)
+        if len(ids) == 0:
+            return None
+
+        index = self._new_index(matrix.shape[1])
+        labels, values = self._split_metadata(metadata)
+        index.add(ids, matrix, labels=labels, values=values)
+        index.unlabeled_ids = []
+        return index
+
+    def _reconcile_index(self, index: VectorIndex):
+        """Sidecar'dan yüklenen indeksi memories tablosuyla eşitler"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, {METADATA_SELECT} FROM memories WHERE embedding IS NOT NULL")
+            db_metadata = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            # Tabloda olmayan kayıtları çıkar
+            extra = [memory_id for memory_id in index.row_of if memory_id not in db_metadata]
+            if extra:
+                index.remove(extra)
+
+            # Sidecar'da olmayan embedding'leri BLOB'lardan ekle
+            missing = [memory_id for memory_id in db_metadata if memory_id not in index.row_of]
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(f"SELECT id, embedding FROM memories WHERE id IN ({placeholders})", chunk)
+                ids, matrix, _ = self._decode_embeddings(cursor.fetchall(), index.dim)
+                if len(ids):
+                    index.add(ids, matrix)
+
+        if extra or missing:
+            logger.info(f"Sidecar tabloyla eşitlendi: {len(extra)} çıkarıldı, {len(missing)} eklendi")
+        live_ids = [memory_id for memory_id in index.row_of if memory_id in db_metadata]
+        self._set_metadata(index, live_ids, [db_metadata[memory_id] for memory_id in live_ids])
+        index.unlabeled_ids = []
+
+    def _load_index_from_sidecar(self) -> Optional[VectorIndex]:
+        """Sidecar varsa indeksi BLOB çözmeden kopyasız eşleyerek yükler"""
+        sidecar = EmbeddingSidecar(self.sidecar_path)
+        if not sidecar.open():
+            return None
+
+        index = None
+        if self.index_type != "exact":
+            index = load_index(self.index_path, storage=sidecar)
+            if index is not None and not self._matches_settings(index):
+                index = None
+        if index is None:
+            index = create_index(self.index_type, sidecar.dim, **self.index_params)
+            index.attach_storage(sidecar)
+        self._reconcile_index(index)
+        return index
+
+    def _journal_position(self) -> int:
+        """Günlükte verilmiş son sıra numarası.
+
+        save_index günlüğü budadığından MAX(seq) sıfıra düşebilir; AUTOINCREMENT
+        sayacı (sqlite_sequence) ise silinen kayıtlardan sonra da korunur.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'memory_journal'), 0),
+                           COALESCE((SELECT MAX(seq) FROM memory_journal), 0))
+            """)
+            return cursor.fetchone()[0]
+
+    def _journal_covers(self, since: int) -> bool:
+        """since'ten sonraki tüm günlük kayıtları hâlâ duruyor mu.
+
+        Başka bir yapılandırma veya süreç anlık görüntü kaydedip günlüğü daha
+        ileri bir sıraya kadar budamışsa aradaki değişiklikler kaybolmuştur.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(seq) FROM memory_journal")
+            low = cursor.fetchone()[0]
+        if low is None:
+            return self._journal_position() <= since
+        return low <= since + 1
+
+    def _replay_journal(self, index: VectorIndex, since: int) -> int:
+        """since'ten sonraki günlük kayıtlarını indekse uygular, son sıra numarasını döner.
+
+        Her id için yalnızca son işlem dikkate alınır. Sidecar kullanılıyorsa
+        vektörler zaten sync() ile gelmiştir; yalnızca eksik kalanlar
+        BLOB'lardan eklenir ve intent etiketleri güncellenir.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT seq, op, memory_id FROM memory_journal WHERE seq > ? ORDER BY seq", (since,))
+            entries = cursor.fetchall()
+            if not entries:
+                return since
+
+            last_op = {}
+            for _, op, memory_id in entries:
+                last_op[memory_id] = op
+            deleted = [memory_id for memory_id, op in last_op.items() if op == "delete" and memory_id in index.row_of]
+            upserts = [memory_id for memory_id, op in last_op.items() if op == "upsert"]
+
+            gone = []
+            for start in range(0, len(upserts), 500):
+                chunk = upserts[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                if index.storage is not None:
+                    cursor.execute(f"SELECT id, {METADATA_SELECT} FROM memories WHERE id IN ({placeholders}) AND embedding IS NOT NULL", chunk)
+                    found = {row[0]: row[1:] for row in cursor.fetchall()}
+                    missing = [memory_id for memory_id in found if memory_id not in index.row_of]
+                    if missing:
+                        marks = ", ".join("?" for _ in missing)
+                        cursor.execute(f"SELECT id, embedding FROM memories WHERE id IN ({marks})", missing)
+                        ids, matrix, _ = self._decode_embeddings(cursor.fetchall(), index.dim)
+                        if len(ids):
+                            index.add(ids, matrix)
+                    present = [memory_id for memory_id in found if memory_id in index.row_of]
+                    self._set_metadata(index, present, [found[memory_id] for memory_id in present])
+                else:
+                    cursor.execute(f"SELECT id, embedding, {METADATA_SELECT} FROM memories WHERE id IN ({placeholders}) AND embedding IS NOT NULL", chunk)
+                    ids, matrix, metadata = self._decode_embeddings(cursor.fetchall(), index.dim)
+                    if len(ids):
+                        labels, values = self._split_metadata(metadata)
+                        index.add(ids, matrix, labels=labels, values=values)
+                    found = set(ids.tolist())
+                gone.extend(memory_id for memory_id in chunk if memory_id not in found and memory_id in index.row_of)
+
+        if deleted or gone:
+            index.remove(deleted + gone)
+        logger.debug(f"Günlükten {len(entries)} değişiklik uygulandı ({len(upserts)} ekleme/güncelleme, {len(deleted) + len(gone)} silme)")
+        return entries[-1][0]
+
+    def _matches_settings(self, index: VectorIndex) -> bool:
+        """Kayıtlı indeksin tipi ve parametreleri güncel ayarlarla aynı mı"""
+        expected = create_index(self.index_type, index.dim, **self.index_params)
+        if expected.kind != index.kind or expected.params() != index.params():
+            logger.info("İndeks ayarları değişmiş, kayıtlı indeks kullanılmıyor")
+            return False
+        return True
+
+    def _load_snapshot(self) -> Optional[VectorIndex]:
+        """Kayıtlı anlık görüntüyü yükler ve yalnızca sonraki günlük kayıtlarını uygular"""
+        checkpoint = read_checkpoint(self.index_path)
+        if not checkpoint or "journal_seq" not in checkpoint:
+            return None
+        if not self._journal_covers(int(checkpoint["journal_seq"])):
+            logger.info("Anlık görüntüden sonraki günlük kayıtları budanmış, indeks yeniden kuruluyor")
+            return None
+
+        storage = None
+        if self.use_sidecar:
+            storage = EmbeddingSidecar(self.sidecar_path)
+            if not storage.open():
+                return None
+        index = load_index(self.index_path, storage=storage)
+        if index is None:
+            return None
+
+        if not self._matches_settings(index):
+            return None
+        if len(index) and not (set(INDEX_LABEL_COLUMNS) <= set(index.labels) and set(INDEX_VALUE_COLUMNS) <= set(index.values)):
+            logger.info("Anlık görüntüde filtre sütunları eksik, indeks yeniden kuruluyor")
+            return None
+
+        self._journal_seq = self._replay_journal(index, int(checkpoint["journal_seq"]))
+        index.unlabeled_ids = []
+
+        count, max_id = self._db_embedding_state()
+        index_max_id = int(index.ids[:index.count][index.alive[:index.count]].max()) if len(index) else 0
+        if len(index) != count or index_max_id != max_id:
+            logger.info("Anlık görüntü veritabanıyla uyuşmuyor, indeks yeniden kuruluyor")
+            return None
+        self._checkpoint_seq = int(checkpoint["journal_seq"])
+        logger.info(f"İndeks anlık görüntüden yüklendi: {len(index)} kayıt, günlük sırası {self._journal_seq}")
+        return index
+
+    def _ensure_index_loaded(self):
+        """İndeksi ilk kullanımda anlık görüntüden, sidecar'dan veya veritabanından yükler"""
+        with self._index_lock:
+            if self._index_loaded:
+                return
+
+            index = self._load_snapshot()
+            rebuilt = index is None
+            if index is None:
+                # Okumadan önceki konum; arada gelen değişiklikler sonra yeniden uygulanır
+                self._journal_seq = self._journal_position()
+                if self.use_sidecar:
+                    index = self._load_index_from_sidecar()
+                if index is None:
+                    index = self._build_index_from_db()
+
+            self._index = index
+            self._index_loaded = True
+            logger.debug(f"İndeks yüklendi: {index.kind if index else 'boş'}, {len(index) if index else 0} kayıt")
+            if rebuilt and index is not None:
+                self.save_index()
+
+    def _sync_index(self):
+        """Diğer süreçlerin değişikliklerini işler; günlük yeterince büyüdüyse anlık görüntü kaydeder"""
+        self._sync_storage()
+        # Sidecar yalnızca vektörleri taşır; intent ve metadata güncellemeleri günlükten gelir
+        self._replay_pending()
+        self._maybe_checkpoint()
+
+    def _replay_pending(self):
+        """Yüklü indekse diğer süreçlerin günlüğe yazdığı ekleme, güncelleme ve silmeleri uygular.
+
+        Günlük bu sürecin konumunun ötesine budanmışsa (başka bir süreç anlık
+        görüntü kaydetmişse) aradaki değişiklikler kaybolduğundan indeks
+        yeniden yüklenir.
+        """
+        with self._index_lock:
+            if not self._index_loaded or self._journal_position() == self._journal_seq:
+                return
+            if self._index is None or not self._journal_covers(self._journal_seq):
+                logger.info("İndeks günlüğün gerisinde kaldı, yeniden yükleniyor")
+                self._index = None
+                self._index_loaded = False
+                self._ensure_index_loaded()
+                return
+            self._journal_seq = self._replay_journal(self._index, self._journal_seq)
+
+    def _maybe_checkpoint(self):
+        """Son anlık görüntüden bu yana checkpoint_every değişiklik biriktiyse indeksi kaydeder.
+
+        Uzun süre açık kalan süreçlerde günlük ve açılıştaki yeniden oynatma
+        maliyeti böylece sınırlı kalır.
+        """
+        if not self.checkpoint_every or not self._index_loaded or self._index is None:
+            return
+        if self._journal_seq - self._checkpoint_seq >= self.checkpoint_every:
+            self.save_index()
+
+    def _sync_storage(self):
+        """Diğer süreçlerin sidecar'a yazdığı kayıtları işler ve filtre etiketlerini tamamlar"""
+        with self._index_lock:
+            if self._index is None and self.use_sidecar and os.path.exists(self.sidecar_path):
+                # Başka bir süreç ilk kayıtları eklemiş olabilir
+                self._index = self._load_index_from_sidecar()
+            if self._index is None or self._index.storage is None:
+                return
+            self._index.sync()
+            pending, self._index.unlabeled_ids = self._index.unlabeled_ids, []
+            if pending:
+                self._refresh_metadata(self._index, pending)
+
+    def _writable_sidecar(self) -> Optional[EmbeddingSidecar]:
+        """İndeks yüklenmemişken yazmaları sidecar'a doğrudan iletmek için açılır"""
+        if self._sidecar is None and self.use_sidecar:
+            sidecar = EmbeddingSidecar(self.sidecar_path)
+            if sidecar.open():
+                self._sidecar = sidecar
+        return self._sidecar
+
+    def _index_add(self, memory_id: int, embedding: np.ndarray):
+        """Bir belleğin embedding'ini yüklü indekse ekler veya günceller"""
+        with self._index_lock:
+            vector = self._normalize_embedding(embedding)
+            if not self._index_loaded:
+                # Sidecar diğer süreçler için güncel kalmalı
+                sidecar = self._writable_sidecar()
+                if sidecar is not None:
+                    if vector is not None and vector.shape[0] == sidecar.dim:
+                        sidecar.append([memory_id], vector[None, :])
+                    else:
+                        sidecar.append_deletes([memory_id])
+                return
+
+            if vector is not None and self._index is None:
+                self._index = self._new_index(vector.shape[0])
+            if vector is None or vector.shape[0] != self._index.dim:
+                logger.warning(f"ID {memory_id} için embedding indekse eklenemedi")
+                self._index_remove([memory_id])
+                return
+
+            self._index.add([memory_id], vector[None, :])
+            self._refresh_metadata(self._index, [memory_id])
+
+    def _index_add_many(self, memory_ids: List[int], embeddings: np.ndarray):
+        """Bir grup belleğin embedding'ini indekse tek seferde ekler"""
+        if not len(memory_ids):
+            return
+        with self._index_lock:
+            matrix, valid = normalize_rows(embeddings)
+            memory_ids = np.asarray(memory_ids, dtype=np.int64)
+            invalid_ids = memory_ids[~valid].tolist()
+            memory_ids, matrix = memory_ids[valid], matrix[valid]
+            if not self._index_loaded:
+                sidecar = self._writable_sidecar()
+                if sidecar is not None:
+                    if len(memory_ids) and matrix.shape[1] == sidecar.dim:
+                        sidecar.append(memory_ids, matrix)
+                    else:
+                        invalid_ids.extend(memory_ids.tolist())
+                    if invalid_ids:
+                        sidecar.append_deletes(invalid_ids)
+                return
+
+            if len(memory_ids) and self._index is None:
+                self._index = self._new_index(matrix.shape[1])
+            if len(memory_ids) and matrix.shape[1] != self._index.dim:
+                invalid_ids.extend(memory_ids.tolist())
+                memory_ids = memory_ids[:0]
+            if invalid_ids:
+                logger.warning(f"{len(invalid_ids)} embedding indekse eklenemedi")
+                self._index_remove(invalid_ids)
+            if len(memory_ids):
+                self._index.add(memory_ids, matrix)
+                self._refresh_metadata(self._index, memory_ids.tolist())
+
+    def _index_remove(self, memory_ids: List[int]):
+        """Silinen bellekleri indeksten çıkarır"""
+        with self._index_lock:
+            if not self._index_loaded:
+                sidecar = self._writable_sidecar()
+                if sidecar is not None and memory_ids:
+                    sidecar.append_deletes(memory_ids)
+            elif self._index is not None:
+                self._index.remove(memory_ids)
+
+    def _index_clear(self):
+        """Yüklü indeksi boşaltır"""
+        with self._index_lock:
+            if not self._index_loaded:
+                sidecar = self._writable_sidecar()
+                if sidecar is not None:
+                    sidecar.truncate()
+            elif self._index is not None:
+                self._index.clear()
+
+    def save_index(self):
+        """İndeksin anlık görüntüsünü günlük konumuyla birlikte kaydeder ve eski günlük kayıtlarını siler.
+
+        Diskteki anlık görüntü bu süreçten daha yeni bir konumdaysa (başka bir
+        süreç kaydetmiş ve günlüğü budamışsa) üzerine yazılmaz. Son kayıttan beri
+        değişiklik yoksa dosya yeniden yazılmaz.
+        """
+        try:
+            with self._index_lock:
+                if not self._index_loaded or self._index is None:
+                    return
+                saved = read_checkpoint(self.index_path)
+                saved_seq = int((saved or {}).get("journal_seq", 0))
+                if saved_seq > self._journal_seq:
+                    logger.debug("Diskteki anlık görüntü daha yeni, kaydedilmiyor")
+                    self._checkpoint_seq = max(self._checkpoint_seq, saved_seq)
+                    return
+                self._sync_storage()
+                self._journal_seq = self._replay_journal(self._index, self._journal_seq)
+                if saved is not None and saved_seq == self._journal_seq == self._checkpoint_seq:
+                    return
+                index = self._index
+                max_id = int(index.ids[:index.count][index.alive[:index.count]].max()) if len(index) else 0
+                index.save(self.index_path, checkpoint={"journal_seq": self._journal_seq, "max_id": max_id})
+                self._checkpoint_seq = self._journal_seq
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM memory_journal WHERE seq <= ?", (self._journal_seq,))
+            logger.debug(f"İndeks anlık görüntüsü kaydedildi: {len(index)} kayıt, günlük sırası {self._journal_seq}")
+        except Exception as e:
+            logger.error(f"İndeks kaydetme hatası: {str(e)}")
+
+    def fit_projection(self, dims: int = 128, sample_size: int = 50000) -> Optional[int]:
+        """Kayıtlı embedding'ler üzerinde PCA izdüşümü uydurup sürümlü olarak kaydeder.
+
+        İzdüşüm kullanan indeksler (projection: pca) dosya değişikliğini bir
+        sonraki aramada görür ve satırlarını yeni sürümle yeniden kodlar.
+        Yeni sürüm numarasını, kayıt yoksa None döner.
+        """
+        try:
+            with self._index_lock:
+                self._ensure_index_loaded()
+                self._sync_index()
+                index = self._index
+                if index is None or len(index) == 0:
+                    logger.warning("İzdüşüm için kayıtlı embedding yok")
+                    return None
+                with index.lock:
+                    rows = np.flatnonzero(index.alive[:index.count])
+                    vectors = np.asarray(index.vectors[rows])
+            previous = Projection.load(self.projection_path)
+            version = previous.version + 1 if previous is not None else 1
+            projection = Projection.fit(vectors, dims, version, sample_size)
+            projection.save(self.projection_path)
+            logger.info(f"PCA izdüşümü kaydedildi: sürüm {version}, {projection.dim} -> {projection.dims} boyut")
+            return version
+        except Exception as e:
+            logger.error(f"İzdüşüm uydurma hatası: {str(e)}")
+            return None
+
+    def close(self):
+        """Tampondaki kullanım istatistiklerini yazar, indeksi kaydeder ve bağlantıları kapatır.
+
+        Kapanış kancası kaldırılır ve bellekteki indeks bırakılır; böylece
+        kapatılan yönetici (ör. LRU'dan düşen bir parça) çöp toplanabilir.
+        """
+        self._usage_stop.set()
+        self._consolidation_stop.set()
+        with self._usage_lock:
+            if self._usage_atexit:
+                atexit.unregister(self.flush_usage_stats)
+                self._usage_atexit = False
+        self.flush_usage_stats()
+        self.save_index()
+        with self._index_lock:
+            self._index = None
+            self._sidecar = None
+            self._index_loaded = False
+        self.close_connections()
+
+    @staticmethod
+    def _emotion_label(emotion_data: Any) -> str:
+        """Duygu analizi sonucundan (sözlük veya metin) kaydedilecek etiketi çıkarır"""
+        if emotion_data is None:
+            return "neutral"
+        if isinstance(emotion_data, dict):
+            return emotion_data.get("emotion", "neutral")
+        if isinstance(emotion_data, str):
+            return emotion_data
+        logger.warning(f"Beklenmeyen duygu veri tipi: {type(emotion_data)}")
+        return "neutral"
+
     def add_memory(self, memory_data: Dict[str, Any]) -> int:
         logger.debug(f"Adding memory: {memory_data}")
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Embedding'i numpy array'den BLOB'a dönüştür
@@ -107,95 +1110,412 @@ class SQLiteMemoryManager:
                         embedding_blob = None
                 
                 # Duygu analizi sonuçlarını işle
-                emotion = "neutral"  # Varsayılan değer
-                if "emotion" in memory_data:
-                    emotion_data = memory_data["emotion"]
-                    logger.debug(f"İşlenen duygu verisi: {emotion_data}")
-                    
-                    if isinstance(emotion_data, dict):
-                        emotion = emotion_data.get("emotion", "neutral")
-                    elif isinstance(emotion_data, str):
-                        emotion = emotion_data
-                    else:
-                        logger.warning(f"Beklenmeyen duygu veri tipi: {type(emotion_data)}")
+                emotion = self._emotion_label(memory_data.get("emotion"))
                 
                 logger.debug(f"Kaydedilecek duygu: {emotion}")
-                
-                cursor.execute("""
-                    INSERT INTO memories (prompt, response, embedding, intent, emotion)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    str(memory_data["prompt"]),
-                    str(memory_data["response"]),
-                    embedding_blob,
-                    str(memory_data.get("intent", "genel")),
-                    str(emotion)
-                ))
-                
-                last_id = cursor.lastrowid
-                logger.debug(f"Bellek başarıyla eklendi, ID: {last_id}")
-                return last_id
+
+                # Aynı prompt-yanıt çifti varsa yeni satır yerine kullanım sayısı artırılır
+                digest = content_hash(memory_data["prompt"], memory_data["response"])
+                existing = None
+                if digest is not None:
+                    cursor.execute("SELECT id FROM memories WHERE content_hash = ?", (digest,))
+                    existing = cursor.fetchone()
+                if existing is not None:
+                    last_id = existing[0]
+                    cursor.execute("""
+                        UPDATE memories SET usage_count = usage_count + 1, last_used = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    """, (last_id,))
+                    logger.debug(f"Bellek zaten kayıtlı, kullanım sayısı artırıldı, ID: {last_id}")
+                else:
+                    cursor.execute("""
+                        INSERT INTO memories (prompt, response, embedding, intent, emotion, prompt_hash, content_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(content_hash) DO UPDATE SET
+                            usage_count = usage_count + 1, last_used = CURRENT_TIMESTAMP
+                    """, (
+                        str(memory_data["prompt"]),
+                        str(memory_data["response"]),
+                        embedding_blob,
+                        str(memory_data.get("intent", "genel")),
+                        str(emotion),
+                        prompt_hash(memory_data["prompt"]) or "",
+                        digest
+                    ))
+                    last_id = cursor.lastrowid
+                    if digest is not None:
+                        # Başka bir süreç aynı çifti araya sokmuş olabilir
+                        cursor.execute("SELECT id FROM memories WHERE content_hash = ?", (digest,))
+                        row = cursor.fetchone()
+                        existing = row if row[0] != last_id else None
+                        last_id = row[0]
+                    logger.debug(f"Bellek başarıyla eklendi, ID: {last_id}")
+            
+            if existing is not None:
+                self._index_touch([last_id])
+            else:
+                if embedding_blob is not None:
+                    # Yüklü embedding matrisini güncelle
+                    self._index_add(last_id, memory_data["embedding"])
+                self._note_inserts(1)
+            return last_id
                 
         except Exception as e:
             logger.error(f"add_memory hatası: {str(e)}")
             raise
 
-    def load_memory(self) -> List[Dict[str, Any]]:
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+    def add_memories(self, memories: Iterable[Dict[str, Any]],
+                     encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+                     chunk_size: int = 1000) -> List[Optional[int]]:
+        """Bellekleri parçalar halinde toplu ekler ve her kaydın bellek ID'sini döner.
+
+        Her parça tek işlemde executemany ile yazılır, indeks de parça başına bir kez
+        güncellenir. encode verilirse embedding'i olmayan prompt'lar parça halinde
+        kodlanır. export_training_json çıktısındaki alanlar (tags, priority, category,
+        context_message, created_at, usage_count, last_used, avg_match_score) korunur.
+        Zaten kayıtlı prompt-yanıt çiftleri için yeni satır açılmaz, mevcut kaydın
+        kullanım sayısı artırılır. Dönen liste girdiyle hizalıdır: prompt'u veya
+        yanıtı boş olduğu için atlanan kayıtların yerinde None bulunur.
+        """
+        inserted: List[Optional[int]] = []
+        chunk: List[Dict[str, Any]] = []
+        for memory_data in memories:
+            chunk.append(memory_data)
+            if len(chunk) >= chunk_size:
+                inserted.extend(self._add_memory_chunk(chunk, encode))
+                chunk = []
+        if chunk:
+            inserted.extend(self._add_memory_chunk(chunk, encode))
+        return inserted
+
+    def _note_inserts(self, count: int):
+        """Yeni kayıtları sayar; check_every aşılınca kapasite sınırını uygular"""
+        if not self.retention["capacity"]:
+            return
+        self._inserts_since_check += count
+        if self._inserts_since_check >= self.retention["check_every"]:
+            self._inserts_since_check = 0
+            self.enforce_capacity()
+
+    def _add_memory_chunk(self, chunk: List[Dict[str, Any]],
+                          encode: Optional[Callable[[List[str]], np.ndarray]] = None) -> List[Optional[int]]:
+        """add_memories için bir parçayı kodlar, yazar ve indekse ekler; atlanan kayıtlar için None"""
+        valid = [position for position, memory_data in enumerate(chunk)
+                 if str(memory_data.get("prompt") or "").strip() and str(memory_data.get("response") or "").strip()]
+        result: List[Optional[int]] = [None] * len(chunk)
+        if len(valid) < len(chunk):
+            logger.warning(f"Boş prompt veya yanıt içeren {len(chunk) - len(valid)} kayıt atlandı")
+        if not valid:
+            return result
+        chunk = [chunk[position] for position in valid]
+
+        embeddings: List[Optional[np.ndarray]] = [
+            None if memory_data.get("embedding") is None else np.asarray(memory_data["embedding"], dtype=np.float32).ravel()
+            for memory_data in chunk
+        ]
+        missing = [position for position, embedding in enumerate(embeddings) if embedding is None]
+        if missing and encode is not None:
+            encoded = np.asarray(encode([str(chunk[position]["prompt"]).strip() for position in missing]),
+                                 dtype=np.float32)
+            for position, embedding in zip(missing, encoded):
+                embeddings[position] = embedding
+
+        rows = []
+        for memory_data, embedding in zip(chunk, embeddings):
+            tags = memory_data.get("tags")
+            rows.append((
+                str(memory_data["prompt"]),
+                str(memory_data["response"]),
+                None if embedding is None else embedding.tobytes(),
+                json.dumps(tags) if isinstance(tags, list) else tags,
+                int(memory_data.get("priority") or 1),
+                str(memory_data.get("intent") or "genel"),
+                memory_data.get("context_message"),
+                str(memory_data.get("category") or "genel"),
+                self._emotion_label(memory_data.get("emotion")),
+                to_db_timestamp(memory_data.get("created_at") or None),
+                int(memory_data.get("usage_count") or 0),
+                to_db_timestamp(memory_data.get("last_used") or None),
+                float(memory_data.get("avg_match_score") or 0.0),
+                prompt_hash(memory_data["prompt"]) or "",
+                content_hash(memory_data["prompt"], memory_data["response"])
+            ))
+        digests = [row[-1] for row in rows]
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            before = self._ids_for_hashes(cursor, digests)
+            # Kayıtlı (veya parça içinde tekrar eden) çiftlerin kullanım sayısı artırılır
+            cursor.executemany(BULK_INSERT_SQL + """
+                ON CONFLICT(content_hash) DO UPDATE SET
+                    usage_count = usage_count + 1, last_used = CURRENT_TIMESTAMP
+            """, [row for row in rows if row[-1] is not None])
+            after = self._ids_for_hashes(cursor, digests)
+            memory_ids = []
+            for row, digest in zip(rows, digests):
+                if digest is None:
+                    # Özeti çıkarılamayan (yalnızca noktalama vb.) prompt'lar tek tek eklenir
+                    cursor.execute(BULK_INSERT_SQL, row)
+                    memory_ids.append(cursor.lastrowid)
+                else:
+                    memory_ids.append(after[digest])
+
+        # Yalnızca yeni satırlar (parça içindeki ilk geçişleri) indekse eklenir
+        new_ids = set()
+        indexed = []
+        for position, (memory_id, digest) in enumerate(zip(memory_ids, digests)):
+            if (digest is None or digest not in before) and memory_id not in new_ids:
+                new_ids.add(memory_id)
+                if embeddings[position] is not None:
+                    indexed.append(position)
+        touched = [memory_id for memory_id in set(memory_ids) if memory_id not in new_ids]
+        if touched:
+            self._index_touch(touched)
+        if indexed:
+            dims = {embeddings[position].shape[0] for position in indexed}
+            if len(dims) == 1:
+                self._index_add_many([memory_ids[position] for position in indexed],
+                                     np.stack([embeddings[position] for position in indexed]))
+            else:
+                for position in indexed:
+                    self._index_add(memory_ids[position], embeddings[position])
+        self._note_inserts(len(new_ids))
+        logger.debug(f"{len(new_ids)} bellek toplu eklendi, {len(memory_ids) - len(new_ids)} tekrar")
+        for position, memory_id in zip(valid, memory_ids):
+            result[position] = memory_id
+        return result
+
+    @staticmethod
+    def _ids_for_hashes(cursor: sqlite3.Cursor, digests: List[Optional[str]]) -> Dict[str, int]:
+        """content_hash -> id eşlemesi (SQLite parametre sınırı için gruplar halinde)"""
+        unique = list({digest for digest in digests if digest is not None})
+        found = {}
+        for start in range(0, len(unique), 500):
+            group = unique[start:start + 500]
+            placeholders = ",".join("?" * len(group))
+            cursor.execute(f"SELECT content_hash, id FROM memories WHERE content_hash IN ({placeholders})", group)
+            found.update(cursor.fetchall())
+        return found
+
+    @staticmethod
+    def _filter_clause(filters: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        """_filter_rows ile aynı filtre sözlüğünü SQL koşullarına çevirir"""
+        conditions, params = [], []
+        filters = filters or {}
+        for name in INDEX_LABEL_COLUMNS:
+            allowed = filters.get(name)
+            if allowed is not None:
+                allowed = [allowed] if isinstance(allowed, str) else list(allowed)
+                conditions.append(f"{name} IN ({','.join('?' * len(allowed))})")
+                params.extend(allowed)
+        for key, condition in (("min_priority", "priority >= ?"), ("max_priority", "priority <= ?")):
+            if filters.get(key) is not None:
+                conditions.append(condition)
+                params.append(filters[key])
+        for key, condition in (("created_after", "created_at >= ?"), ("created_before", "created_at < ?")):
+            if filters.get(key) is not None:
+                conditions.append(condition)
+                params.append(to_db_timestamp(filters[key]))
+        unknown = set(filters) - set(INDEX_LABEL_COLUMNS) - {"min_priority", "max_priority", "created_after", "created_before"}
+        if unknown:
+            logger.warning(f"Bilinmeyen filtreler yok sayıldı: {sorted(unknown)}")
+        return conditions, params
+
+    def iter_memories(self, columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+                      batch_size: int = 1000, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """Bellekleri sayfa sayfa dolaşan üreteç; bellek kullanımı sayfa boyutuyla sınırlıdır.
+
+        Sayfalar anahtar kümesiyle (id > son id, newest_first açıksa (created_at, id)
+        üzerinden geriye) okunur, her sayfa kısa bir okuma işleminde alınır. columns
+        verilmezse embedding dışındaki tüm sütunlar döner; tags JSON'dan çözülür.
+        filters, search() ile aynı anahtarları kabul eder.
+        """
+        columns = list(columns or [column for column in MEMORY_COLUMNS if column != "embedding"])
+        unknown = [column for column in columns if column not in MEMORY_COLUMNS]
+        if unknown:
+            raise ValueError(f"Bilinmeyen sütunlar: {unknown}")
+        selected = ["id", "created_at"] + [column for column in columns if column not in ("id", "created_at")]
+        for rows in self._iter_pages(selected, filters, batch_size, newest_first):
+            for row in rows:
+                record = dict(zip(selected, row))
+                if "tags" in record:
+                    record["tags"] = json.loads(record["tags"]) if record["tags"] else []
+                yield {column: record[column] for column in columns}
+
+    def _iter_pages(self, selected: List[str], filters: Optional[Dict[str, Any]] = None,
+                    batch_size: int = 1000, newest_first: bool = False) -> Iterator[List[Tuple]]:
+        """Seçilen ifadelerin satırlarını anahtar kümesi sayfalamasıyla sayfa sayfa döner.
+
+        selected[0] id, newest_first açıksa selected[1] ham created_at olmalıdır.
+        """
+        conditions, params = self._filter_clause(filters)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        if newest_first:
+            query = (f"SELECT {', '.join(selected)} FROM memories "
+                     f"WHERE (created_at, id) < (?, ?){where} "
+                     f"ORDER BY created_at DESC, id DESC LIMIT ?")
+            # created_at NULL olan kayıtlar en sona kalır ve ayrıca okunur
+            null_query = (f"SELECT {', '.join(selected)} FROM memories "
+                          f"WHERE created_at IS NULL AND id < ?{where} ORDER BY id DESC LIMIT ?")
+        else:
+            query = f"SELECT {', '.join(selected)} FROM memories WHERE id > ?{where} ORDER BY id LIMIT ?"
+
+        last_id, last_created = (2 ** 63 - 1, "\uffff") if newest_first else (0, None)
+        null_phase = False
+        while True:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT * FROM memories")
+                if null_phase:
+                    cursor.execute(null_query, [last_id] + params + [batch_size])
+                elif newest_first:
+                    cursor.execute(query, [last_created, last_id] + params + [batch_size])
+                else:
+                    cursor.execute(query, [last_id] + params + [batch_size])
                 rows = cursor.fetchall()
-                return [{
-                    "id": row["id"],
-                    "prompt": row["prompt"],
-                    "response": row["response"],
-                    "tags": json.loads(row["tags"]) if row["tags"] else [],
-                    "priority": row["priority"],
-                    "intent": row["intent"],
-                    "context_message": row["context_message"],
-                    "category": row["category"],
-                    "created_at": row["created_at"],
-                    "usage_count": row["usage_count"],
-                    "last_used": row["last_used"],
-                    "avg_match_score": row["avg_match_score"]
-                } for row in rows]
+            if rows:
+                yield rows
+                last_id = rows[-1][0]
+                last_created = rows[-1][1] if newest_first else None
+            if len(rows) < batch_size:
+                if newest_first and not null_phase:
+                    null_phase, last_id = True, 2 ** 63 - 1
+                    continue
+                return
+
+    def load_columns(self, columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+                     batch_size: int = 10000) -> MemoryColumns:
+        """Bellekleri sütun tabanlı MemoryColumns olarak yükler.
+
+        Satır başına sözlük yerine sayısal sütunlar NumPy dizisi, intent/category/
+        emotion kod dizisi, metinler UTF-8 tamponu olarak tutulur; created_at ve
+        last_used Unix zamanına çevrilir. columns verilmezse embedding dışındaki
+        tüm sütunlar yüklenir.
+        """
+        columns = list(columns or [column for column in MEMORY_COLUMNS if column != "embedding"])
+        builder = MemoryColumnsBuilder(columns)
+        # Sayfalama için id başta seçilir, tarih sütunları SQLite'ta Unix zamanına çevrilir
+        expressions = ["id"] + [
+            f"CAST(strftime('%s', {column}) AS REAL)" if column in ("created_at", "last_used") else column
+            for column in columns
+        ]
+        for rows in self._iter_pages(expressions, filters, batch_size):
+            builder.append([row[1:] for row in rows])
+        return builder.build()
+
+    def load_memory(self) -> List[Dict[str, Any]]:
+        try:
+            return list(self.iter_memories(LOAD_MEMORY_COLUMNS))
         except Exception as e:
             logger.error(f"Error in load_memory: {str(e)}")
             return []
 
     def update_usage_stats(self, memory_id: int, match_score: float = None):
+        """Bir eşleşmenin kullanım istatistiklerini kaydeder (tampon açıksa sonradan yazılır)"""
+        self.update_usage_stats_many([(memory_id, match_score)])
+
+    def _index_touch(self, memory_ids: List[int]):
+        """Sıralama önselleri için indeksteki kullanım sayısını ve son kullanım zamanını günceller"""
+        with self._index_lock:
+            if self._index is None:
+                return
+            self._index.bump_values(memory_ids, "usage_count")
+            self._index.set_values(memory_ids, "last_used", [time.time()] * len(memory_ids))
+
+    def update_usage_stats_many(self, hits: List[Tuple[int, Optional[float]]]):
+        """Birden çok eşleşmenin kullanım istatistiklerini kaydeder.
+
+        usage_flush_interval > 0 ise eşleşmeler bellekte birleştirilir ve arka
+        plandaki yazıcı (veya flush_usage_stats / close) tarafından tek
+        executemany transaction'ında yazılır; sohbet yolu yazma kilidini beklemez.
+        """
+        if not hits:
+            return
+        try:
+            now = time.time()
+            with self._usage_lock:
+                for memory_id, match_score in hits:
+                    entry = self._usage_buffer.setdefault(int(memory_id), [0, 0, 0.0, now])
+                    entry[0] += 1
+                    if match_score is not None:
+                        entry[1] += 1
+                        entry[2] += float(match_score)
+                    entry[3] = now
+            self._index_touch([memory_id for memory_id, _ in hits])
+
+            if self.usage_flush_interval > 0:
+                self._start_usage_writer()
+            else:
+                self.flush_usage_stats()
+        except Exception as e:
+            logger.error(f"Error in update_usage_stats_many: {str(e)}")
+
+    def flush_usage_stats(self) -> int:
+        """Tampondaki kullanım istatistiklerini tek transaction'da yazar, yazılan kayıt sayısını döner"""
+        with self._usage_lock:
+            pending, self._usage_buffer = self._usage_buffer, {}
+        if not pending:
+            return 0
+        rows = [
+            (
+                scored, score_sum, scored, hits,
+                to_db_timestamp(last_used),
+                memory_id
+            )
+            for memory_id, (hits, scored, score_sum, last_used) in pending.items()
+        ]
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
-                if match_score is not None:
-                    cursor.execute("""
-                        UPDATE memories 
-                        SET usage_count = usage_count + 1,
-                            last_used = CURRENT_TIMESTAMP,
-                            avg_match_score = ((avg_match_score * usage_count) + ?) / (usage_count + 1)
-                        WHERE id = ?
-                    """, (match_score, memory_id))
-                else:
-                    cursor.execute("""
-                        UPDATE memories 
-                        SET usage_count = usage_count + 1,
-                            last_used = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    """, (memory_id,))
-                conn.commit()
+                # Sağ taraftaki ifadeler satırın eski değerlerini kullanır
+                cursor.executemany("""
+                    UPDATE memories 
+                    SET avg_match_score = CASE WHEN ? > 0
+                            THEN ((avg_match_score * usage_count) + ?) / (usage_count + ?)
+                            ELSE avg_match_score END,
+                        usage_count = usage_count + ?,
+                        last_used = ?
+                    WHERE id = ?
+                """, rows)
+            return len(rows)
         except Exception as e:
-            logger.error(f"Error in update_usage_stats: {str(e)}")
+            logger.error(f"Kullanım istatistikleri yazılamadı: {str(e)}")
+            # Kaybolmaması için tampona geri koy
+            with self._usage_lock:
+                for memory_id, (hits, scored, score_sum, last_used) in pending.items():
+                    entry = self._usage_buffer.setdefault(memory_id, [0, 0, 0.0, last_used])
+                    entry[0] += hits
+                    entry[1] += scored
+                    entry[2] += score_sum
+                    entry[3] = max(entry[3], last_used)
+            return 0
+
+    def _start_usage_writer(self):
+        """Tamponu aralıklarla boşaltan arka plan iş parçacığını ilk ihtiyaçta başlatır"""
+        with self._usage_lock:
+            if self._usage_thread is not None and self._usage_thread.is_alive():
+                return
+            self._usage_stop.clear()
+            self._usage_thread = threading.Thread(target=self._usage_writer, daemon=True)
+            self._usage_thread.start()
+            if not self._usage_atexit:
+                # Kapanışta tamponda kalanlar yazılsın
+                atexit.register(self.flush_usage_stats)
+                self._usage_atexit = True
+
+    def _usage_writer(self):
+        while not self._usage_stop.wait(self.usage_flush_interval):
+            self.flush_usage_stats()
 
     def delete_memory(self, memory_id: int) -> bool:
         """ID'ye göre hafıza kaydını siler"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM memories WHERE id = ?", (memory_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+                deleted = cursor.rowcount > 0
+            if deleted:
+                self._index_remove([memory_id])
+            return deleted
         except Exception as e:
             logger.error(f"Error in delete_memory: {str(e)}")
             return False
@@ -203,7 +1523,7 @@ class SQLiteMemoryManager:
     def update_memory(self, memory_id: int, new_data: Dict[str, Any]) -> bool:
         """ID'ye göre hafıza kaydını günceller"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Güncellenecek alanları ve değerleri hazırla
@@ -211,11 +1531,24 @@ class SQLiteMemoryManager:
                 params = []
                 
                 for key, value in new_data.items():
-                    if key in ["prompt", "response", "intent", "priority", "tags"]:
+                    if key in ["prompt", "response", "intent", "priority", "tags", "embedding"]:
                         if key == "tags":
                             value = json.dumps(value)
+                        elif key == "embedding" and value is not None:
+                            value = np.asarray(value, dtype=np.float32).tobytes()
                         update_fields.append(f"{key} = ?")
                         params.append(value)
+                        if key == "prompt":
+                            update_fields.append("prompt_hash = ?")
+                            params.append(prompt_hash(value) or "")
+
+                if "prompt" in new_data or "response" in new_data:
+                    cursor.execute("SELECT prompt, response FROM memories WHERE id = ?", (memory_id,))
+                    current = cursor.fetchone()
+                    if current is not None:
+                        update_fields.append("content_hash = ?")
+                        params.append(content_hash(new_data.get("prompt", current[0]),
+                                                   new_data.get("response", current[1])))
                 
                 if update_fields:
                     params.append(memory_id)  # WHERE id = ? için
@@ -225,160 +1558,705 @@ class SQLiteMemoryManager:
                         WHERE id = ?
                     """
                     cursor.execute(query, params)
-                    conn.commit()
-                    return cursor.rowcount > 0
-                return False
+                    updated = cursor.rowcount > 0
+                else:
+                    return False
+
+            # Embedding veya filtrelenen alanlar değiştiyse indeksi güncelle
+            if updated and "embedding" in new_data:
+                if new_data["embedding"] is None:
+                    self._index_remove([memory_id])
+                else:
+                    self._index_add(memory_id, new_data["embedding"])
+            elif updated and ("intent" in new_data or "priority" in new_data):
+                with self._index_lock:
+                    if self._index is not None:
+                        self._refresh_metadata(self._index, [memory_id])
+            return updated
         except Exception as e:
             logger.error(f"Error in update_memory: {str(e)}")
             return False
 
     def delete_by_intent(self, intent: str) -> int:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
+                cursor.execute("SELECT id FROM memories WHERE intent = ?", (intent,))
+                memory_ids = [row[0] for row in cursor.fetchall()]
                 cursor.execute("DELETE FROM memories WHERE intent = ?", (intent,))
                 deleted = cursor.rowcount
-                conn.commit()
-                return deleted
+            self._index_remove(memory_ids)
+            return deleted
         except Exception as e:
             logger.error(f"Error in delete_by_intent: {str(e)}")
             return 0
 
     def clear_all(self) -> bool:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM memories")
-                conn.commit()
-                return True
+            self._index_clear()
+            return True
         except Exception as e:
             logger.error(f"Error in clear_all: {str(e)}")
             return False
 
     def remove_duplicates(self) -> int:
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    DELETE FROM memories 
-                    WHERE id NOT IN (
-                        SELECT MIN(id)
-                        FROM memories 
-                        GROUP BY prompt, response
-                    )
-                """)
-                deleted = cursor.rowcount
-                conn.commit()
-                return deleted
+            with self.transaction() as conn:
+                # Tekil content_hash indeksi yeni tekrarları engeller; gruplama indeks üzerinden yapılır
+                memory_ids = self._merge_duplicates(conn.cursor())
+                deleted = len(memory_ids)
+            self._index_remove(memory_ids)
+            return deleted
         except Exception as e:
             logger.error(f"Error in remove_duplicates: {str(e)}")
             return 0
 
-    def find_best_response(self, query_embedding: np.ndarray) -> Tuple[Optional[str], float]:
-        """En iyi yanıtı bul"""
+    def consolidate_near_duplicates(self, threshold: float = 0.95, match_response: bool = True,
+                                    bits: Optional[int] = None, tables: int = 16) -> int:
+        """Birbirinin yakın tekrarı olan bellekleri tek bir kanonik kayıtta birleştirir.
+
+        Adaylar prompt embedding'leri üzerinde LSH ile bulunur ve kosinüs eşiğiyle
+        doğrulanır. Her kümede en çok kullanılan (eşitlikte en yüksek öncelikli, en
+        eski) kayıt kalır; kanonik kayda ``threshold`` kadar benzemeyen üyeler
+        birleştirilmez. match_response açıksa yalnızca normalize yanıtı aynı olan
+        kayıtlar birleşir. Kullanım sayıları toplanır. Silinen kayıt sayısını döner.
+        """
         try:
-            if query_embedding is None:
-                logger.error("query_embedding None olamaz")
-                return None, 0.0
+            # Silinecek kayıtlara ait tamponlanmış kullanım kaybolmasın
+            self.flush_usage_stats()
+            # İndeksin (veya sidecar'ın) tuttuğu normalize vektörler kopyalanmadan kullanılır;
+            # BLOB'lar çözülmez, metadata yalnızca aday çiftlerdeki kayıtlar için okunur
+            self._ensure_index_loaded()
+            self._sync_index()
+            with self._index_lock:
+                index = self._index
+                if index is None:
+                    return 0
+                with index.lock:
+                    rows = np.flatnonzero(index.alive[:index.count])
+                    ids = index.ids[rows].copy()
+                    matrix = index.vectors
+            if len(ids) < 2:
+                return 0
 
-            if not isinstance(query_embedding, np.ndarray):
-                logger.error(f"query_embedding numpy array olmalı, şu an: {type(query_embedding)}")
-                return None, 0.0
+            pairs = near_duplicate_pairs(matrix, threshold=threshold, bits=bits, tables=tables, rows=rows)
+            candidates = np.unique(pairs)
+            metadata: Dict[int, Dict[str, Any]] = {}
+            for start in range(0, len(candidates), 500):
+                chunk = candidates[start:start + 500]
+                found = self._fetch_memories(ids[chunk].tolist(), ["response", "usage_count", "priority"])
+                metadata.update((int(position), found[int(ids[position])]) for position in chunk
+                                if int(ids[position]) in found)
+            # Bu arada silinmiş kayıtlar birleştirmeye katılmaz
+            if len(pairs):
+                pairs = pairs[[left in metadata and right in metadata for left, right in pairs.tolist()]]
+            responses = {position: normalize_prompt(row["response"]) for position, row in metadata.items()} \
+                if match_response else None
+            if match_response and len(pairs):
+                pairs = pairs[[responses[left] == responses[right] for left, right in pairs.tolist()]]
+
+            merges = []
+            for group in connected_groups(len(ids), pairs):
+                canonical = max(group, key=lambda position: (metadata[position]["usage_count"] or 0,
+                                                             metadata[position]["priority"] or 0, -ids[position]))
+                vectors = np.asarray(matrix[rows[group]], dtype=np.float32)
+                similar = vectors @ np.asarray(matrix[rows[canonical]], dtype=np.float32) >= threshold
+                members = [int(ids[position]) for position, ok in zip(group.tolist(), similar)
+                           if ok and position != canonical
+                           and (not match_response or responses[position] == responses[canonical])]
+                if members:
+                    merges.append((int(ids[canonical]), members))
+            if not merges:
+                return 0
 
-            with sqlite3.connect(self.db_path) as conn:
+            deleted = []
+            with self.transaction() as conn:
                 cursor = conn.cursor()
-                
-                # Tüm bellekleri getir
-                cursor.execute("SELECT id, embedding, response FROM memories WHERE embedding IS NOT NULL")
-                memories = cursor.fetchall()
-                
-                if not memories:
-                    logger.warning("Veritabanında hiç bellek bulunamadı")
-                    return None, 0.0
-                    
-                # Benzerlik skorlarını hesapla
-                similarities = []
-                for memory in memories:
-                    try:
-                        memory_id, memory_embedding_blob, response = memory
-                        
-                        if memory_embedding_blob is None:
-                            logger.debug(f"ID {memory_id} için embedding verisi yok")
-                            continue
-                            
-                        memory_embedding = np.frombuffer(memory_embedding_blob, dtype=np.float32)
-                        
-                        # Boyut kontrolü
-                        if memory_embedding.shape != query_embedding.shape:
-                            logger.warning(f"Embedding boyutları uyuşmuyor: {memory_embedding.shape} != {query_embedding.shape}")
-                            continue
-                        
-                        # Normalize et
-                        memory_embedding_norm = np.linalg.norm(memory_embedding)
-                        query_embedding_norm = np.linalg.norm(query_embedding)
-                        
-                        if memory_embedding_norm == 0 or query_embedding_norm == 0:
-                            logger.warning(f"Sıfır norm tespit edildi - Memory: {memory_embedding_norm}, Query: {query_embedding_norm}")
-                            continue
-                            
-                        # Kosinüs benzerliği hesapla
-                        similarity = np.dot(query_embedding, memory_embedding) / (memory_embedding_norm * query_embedding_norm)
-                        
-                        logger.debug(f"ID {memory_id} için benzerlik skoru: {similarity}")
-                        similarities.append((response, similarity, memory_id))
-                        
-                    except Exception as e:
-                        logger.error(f"Bellek {memory[0]} için benzerlik hesaplama hatası: {str(e)}")
+                for canonical_id, members in merges:
+                    placeholders = ",".join("?" * len(members))
+                    # Okuma ile yazma arasında gelen kullanımlar kaybolmasın diye toplama SQL'de yapılır
+                    cursor.execute(f"""
+                        SELECT COALESCE(SUM(usage_count), 0), COALESCE(SUM(avg_match_score * usage_count), 0),
+                               MAX(last_used), COUNT(*)
+                        FROM memories WHERE id IN ({placeholders})
+                    """, members)
+                    usage_count, score_sum, last_used, found = cursor.fetchone()
+                    if not found:
                         continue
-                
-                if not similarities:
-                    logger.warning("Hiç geçerli benzerlik skoru hesaplanamadı")
+                    cursor.execute("""
+                        UPDATE memories SET
+                            avg_match_score = CASE WHEN usage_count + ? > 0
+                                THEN ((avg_match_score * usage_count) + ?) / (usage_count + ?)
+                                ELSE avg_match_score END,
+                            usage_count = usage_count + ?,
+                            last_used = COALESCE(MAX(last_used, ?), last_used, ?)
+                        WHERE id = ?
+                    """, (usage_count, score_sum, usage_count, usage_count, last_used, last_used, canonical_id))
+                    if cursor.rowcount == 0:
+                        continue
+                    cursor.execute(f"DELETE FROM memories WHERE id IN ({placeholders})", members)
+                    deleted.extend(members)
+            self._index_remove(deleted)
+            if deleted:
+                logger.info(f"{len(deleted)} yakın tekrar {len(merges)} kanonik kayıtta birleştirildi")
+            return len(deleted)
+        except Exception as e:
+            logger.error(f"Yakın tekrar birleştirme hatası: {str(e)}")
+            return 0
+
+    def enforce_capacity(self, capacity: Optional[int] = None) -> int:
+        """Kayıt sayısını kapasiteye indirir; çıkarılan kayıtlar önce arşive yazılır.
+
+        Adaylar politikaya göre seçilir: lfu en az kullanılanları (eşitlikte en
+        eski kullanılanı), lru en uzun süredir kullanılmayanları çıkarır; hiç
+        kullanılmamış kayıtlarda eklenme zamanı esas alınır. priority_floor ve
+        üstü öncelikli kayıtlara ve son grace_seconds içinde eklenenlere
+        dokunulmaz, bu yüzden kayıt sayısı geçici olarak kapasiteyi aşabilir.
+        Çıkarılan kayıt sayısını döner.
+        """
+        capacity = self.retention["capacity"] if capacity is None else capacity
+        if not capacity or capacity <= 0:
+            return 0
+        evicted = 0
+        try:
+            # Kullanım istatistikleri güncel olmalı
+            self.flush_usage_stats()
+            with self.transaction() as conn:
+                excess = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] - capacity
+            order = EVICTION_ORDER[self.retention["policy"]]
+            # Yeni eklenen kayıtlar kullanılma fırsatı bulmadan çıkarılmasın
+            cutoff = to_db_timestamp(time.time() - float(self.retention["grace_seconds"] or 0))
+            while excess > 0:
+                with self.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(f"""
+                        SELECT id FROM memories WHERE priority < ? AND created_at < ? ORDER BY {order} LIMIT ?
+                    """, (self.retention["priority_floor"], cutoff, min(excess, self.retention["batch_size"])))
+                    memory_ids = [row[0] for row in cursor.fetchall()]
+                    if not memory_ids:
+                        logger.warning(f"Kapasite aşıldı ama çıkarılabilecek kayıt yok ({excess} fazla; "
+                                       f"öncelikli veya son {self.retention['grace_seconds']} sn içinde eklenmiş)")
+                        break
+                    # Arşiv silmeden önce yazılır; silme geri alınırsa yeniden içe aktarmada
+                    # content_hash tekrarı engeller
+                    self._archive_memories(cursor, memory_ids)
+                    placeholders = ",".join("?" * len(memory_ids))
+                    cursor.execute(f"DELETE FROM memories WHERE id IN ({placeholders})", memory_ids)
+                self._index_remove(memory_ids)
+                evicted += len(memory_ids)
+                excess -= len(memory_ids)
+            if evicted:
+                logger.info(f"Kapasite sınırı: {evicted} bellek arşive taşındı ({self.archive_path})")
+            return evicted
+        except Exception as e:
+            logger.error(f"Kapasite uygulama hatası: {str(e)}")
+            return evicted
+
+    def _archive_memories(self, cursor: sqlite3.Cursor, memory_ids: List[int]):
+        """Kayıtları sıkıştırılmış, yalnızca sona eklenen JSONL arşivine yazar"""
+        placeholders = ",".join("?" * len(memory_ids))
+        columns = [column for column in MEMORY_COLUMNS if column != "id"]
+        cursor.execute(f"SELECT {', '.join(columns)} FROM memories WHERE id IN ({placeholders})", memory_ids)
+        archived_at = to_db_timestamp(time.time())
+        lines = []
+        for row in cursor.fetchall():
+            record = dict(zip(columns, row))
+            if record["embedding"] is not None:
+                record["embedding"] = base64.b64encode(record["embedding"]).decode("ascii")
+            record["tags"] = json.loads(record["tags"]) if record["tags"] else []
+            record["archived_at"] = archived_at
+            lines.append(json.dumps(record, ensure_ascii=False))
+        # Her ekleme yeni bir gzip üyesi açar; gzip okuyucuları üyeleri art arda okur
+        with self._archive_lock, gzip.open(self.archive_path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def iter_archive(self, path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Arşivdeki kayıtları embedding'leri çözülmüş olarak dolaşır"""
+        path = path or self.archive_path
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("embedding"):
+                    record["embedding"] = np.frombuffer(base64.b64decode(record["embedding"]), dtype=np.float32)
+                yield record
+
+    def import_archive(self, path: Optional[str] = None, chunk_size: int = 1000) -> int:
+        """Arşivlenmiş kayıtları geri yükler; zaten kayıtlı olanlar tekrar eklenmez.
+
+        Arşiv yalnızca sona eklendiğinden içe aktarılan kayıtlar dosyada kalır.
+        Geri yüklenen kayıt sayısını döner.
+        """
+        try:
+            memory_ids = [memory_id for memory_id in self.add_memories(self.iter_archive(path), chunk_size=chunk_size)
+                          if memory_id is not None]
+            logger.info(f"Arşivden {len(memory_ids)} kayıt işlendi")
+            return len(memory_ids)
+        except Exception as e:
+            logger.error(f"Arşiv içe aktarma hatası: {str(e)}")
+            return 0
+
+    def start_consolidation(self, interval: float, threshold: float = 0.95):
+        """consolidate_near_duplicates'i arka planda belirli aralıklarla çalıştırır"""
+        if interval <= 0 or (self._consolidation_thread is not None and self._consolidation_thread.is_alive()):
+            return
+        self._consolidation_stop.clear()
+
+        def run():
+            while not self._consolidation_stop.wait(interval):
+                self.consolidate_near_duplicates(threshold=threshold)
+
+        self._consolidation_thread = threading.Thread(target=run, daemon=True)
+        self._consolidation_thread.start()
+
+    def _prepare_query(self, query_embedding: np.ndarray) -> Optional[np.ndarray]:
+        """Sorgu embedding'ini doğrular, normalize eder ve indeksi hazırlar"""
+        if query_embedding is None:
+            logger.error("query_embedding None olamaz")
+            return None
+
+        if not isinstance(query_embedding, np.ndarray):
+            logger.error(f"query_embedding numpy array olmalı, şu an: {type(query_embedding)}")
+            return None
+
+        query_vector = self._normalize_embedding(query_embedding)
+        if query_vector is None:
+            logger.warning("Sorgu embedding'i sıfır norma sahip")
+            return None
+
+        self._ensure_index_loaded()
+        self._sync_index()
+        if self._index is None or len(self._index) == 0:
+            logger.warning("Veritabanında hiç bellek bulunamadı")
+            return None
+
+        # Boyut kontrolü
+        if self._index.dim != query_vector.shape[0]:
+            logger.warning(f"Embedding boyutları uyuşmuyor: {self._index.dim} != {query_vector.shape[0]}")
+            return None
+
+        return query_vector
+
+    def _filter_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Filtre sözlüğünü indeks satırlarına çevirir.
+
+        Desteklenen anahtarlar: intent, category, emotion (tek değer veya
+        liste), min_priority, max_priority, created_after, created_before.
+        """
+        labels = {}
+        for name in INDEX_LABEL_COLUMNS:
+            allowed = filters.get(name)
+            if allowed is not None:
+                labels[name] = [allowed] if isinstance(allowed, str) else list(allowed)
+        ranges = {}
+        if filters.get("min_priority") is not None or filters.get("max_priority") is not None:
+            ranges["priority"] = (filters.get("min_priority"), filters.get("max_priority"))
+        if filters.get("created_after") is not None or filters.get("created_before") is not None:
+            # _filter_clause ile aynı anlam: saniyeye yuvarlanmış created_after dahil, created_before hariç
+            # (indeks aralıkları kapalı olduğundan üst sınır bir alttaki float'a çekilir)
+            after, before = to_timestamp(filters.get("created_after")), to_timestamp(filters.get("created_before"))
+            ranges["created_at"] = (None if after is None else float(np.floor(after)),
+                                    None if before is None else float(np.nextafter(np.floor(before), -np.inf)))
+        unknown = set(filters) - set(INDEX_LABEL_COLUMNS) - {"min_priority", "max_priority", "created_after", "created_before"}
+        if unknown:
+            logger.warning(f"Bilinmeyen filtreler yok sayıldı: {sorted(unknown)}")
+        return self._index.filter_rows(labels, ranges)
+
+    def _search_index(self, query_vector: np.ndarray, k: int, intent: Optional[str] = None,
+                      filters: Optional[Dict[str, Any]] = None,
+                      min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """İndeksten en iyi k id'yi, kosinüs skorlarını ve sıralama puanlarını döner.
+
+        Intent verilirse önce o bölümde arar; bölümün en iyisi çağıranın kabul
+        eşiğini (min_score ve similarity_threshold'un büyüğü) geçmezse tüm
+        indekse düşer. filters verilirse yalnızca filtreyi sağlayan satırlar
+        skorlanır. Sıralama önselleri açıksa kosinüse göre en iyi adaylar
+        birleşik puana göre yeniden sıralanır.
+        """
+        with self._index_lock:
+            ids, scores = self._search_candidates(query_vector, k, intent, filters, min_score)
+            return self.ranker.rank(self._index, ids, scores, k)
+
+    def _search_candidates(self, query_vector: np.ndarray, k: int, intent: Optional[str] = None,
+                           filters: Optional[Dict[str, Any]] = None,
+                           min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        if self.ranker.enabled:
+            k = max(k, self.ranker.candidates)
+        with self._index_lock:
+            rows = self._filter_rows(filters) if filters else None
+            if intent:
+                # Önce tahmin edilen intent'in bölümünü tara
+                partition = self._index.label_rows("intent", intent)
+                if rows is not None:
+                    partition = np.intersect1d(partition, rows, assume_unique=True)
+                ids, scores = self._index.search_rows(query_vector, partition, k=k)
+                # Bölüm yalnızca aramayı daraltır; çağıranın reddedeceği bir eşleşme daha iyisini gizlemesin
+                if len(ids) and scores[0] >= max(self.similarity_threshold, min_score):
+                    logger.debug(f"Intent bölümünde eşleşme bulundu: {intent}")
+                    return ids, scores
+            if rows is not None:
+                return self._index.search_rows(query_vector, rows, k=k)
+            return self._index.search(query_vector, k=k)
+
+    def _fetch_memories(self, memory_ids: List[int], columns: List[str]) -> Dict[int, Dict[str, Any]]:
+        """Verilen id'lerin istenen sütunlarını id -> dict olarak getirir"""
+        if not memory_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in memory_ids)
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(
+                f"SELECT id, {', '.join(columns)} FROM memories WHERE id IN ({placeholders})",
+                [int(memory_id) for memory_id in memory_ids]
+            )
+            return {row["id"]: dict(row) for row in cursor.fetchall()}
+
+    def _forget_missing(self, memory_ids: List[int], rows: Dict[int, Any]) -> bool:
+        """Veritabanında artık bulunmayan adayları indeksten çıkarır; çıkarılan varsa True döner.
+
+        Kayıt, indeks günlüğü işledikten sonra başka bir süreçte silinmiş
+        olabilir; çağıran aramayı tekrarlayarak bir sonraki en iyiyi alır.
+        """
+        missing = [int(memory_id) for memory_id in memory_ids if int(memory_id) not in rows]
+        if missing:
+            logger.debug(f"{len(missing)} aday veritabanında yok, indeksten çıkarılıyor")
+            self._index_remove(missing)
+        return bool(missing)
+
+    def search(self, query_embedding: np.ndarray, k: int = 5, min_score: float = 0.0,
+               intent: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Sorguya en benzer k belleği skor ve metadata ile birlikte getir.
+
+        filters ör. {"intent": ["selam", "veda"], "category": "genel",
+        "min_priority": 2, "created_after": "2024-01-01"}; skorlama öncesinde
+        maske olarak uygulanır.
+        """
+        try:
+            query_vector = self._prepare_query(query_embedding)
+            if query_vector is None:
+                return []
+
+            for _ in range(MISSING_RETRIES + 1):
+                ids, scores, rank_scores = self._search_index(query_vector, k, intent, filters, min_score)
+                keep = scores >= min_score
+                ids, scores, rank_scores = ids[keep], scores[keep], rank_scores[keep]
+
+                rows = self._fetch_memories(ids.tolist(), ["prompt", "response", "intent", "priority"])
+                if not self._forget_missing(ids.tolist(), rows):
+                    break
+            results = []
+            for memory_id, score, rank_score in zip(ids.tolist(), scores.tolist(), rank_scores.tolist()):
+                row = rows.get(memory_id)
+                if row is None:
+                    continue
+                results.append({
+                    "id": memory_id,
+                    "score": float(score),
+                    "rank_score": float(rank_score),
+                    "prompt": row["prompt"],
+                    "response": row["response"],
+                    "intent": row["intent"],
+                    "priority": row["priority"]
+                })
+            return results
+
+        except Exception as e:
+            logger.error(f"search hatası: {str(e)}")
+            return []
+
+    @staticmethod
+    def _fts_terms(query: str) -> List[str]:
+        """Sorgudaki kelimeleri FTS5 sözdiziminden kaçırılmış ifadeler olarak döner"""
+        return ['"' + term.replace('"', '""') + '"' for term in re.findall(r"\w+", str(query))]
+
+    def _text_rank(self, match: str, k: int, intent: Optional[str] = None) -> List[Tuple[int, float]]:
+        """FTS5 MATCH ifadesi için (id, bm25) listesi; skor büyüdükçe eşleşme güçlenir"""
+        query = """
+            SELECT memories_fts.rowid, -bm25(memories_fts, 2.0, 1.0) AS score
+            FROM memories_fts
+        """
+        params: List[Any] = [match]
+        if intent:
+            query += " JOIN memories ON memories.id = memories_fts.rowid WHERE memories_fts MATCH ? AND memories.intent = ?"
+            params.append(intent)
+        else:
+            query += " WHERE memories_fts MATCH ?"
+        query += " ORDER BY bm25(memories_fts, 2.0, 1.0) LIMIT ?"
+        params.append(k)
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [(memory_id, float(score)) for memory_id, score in cursor.fetchall()]
+
+    def _results_for(self, ranked: List[Tuple[int, float]], **extra) -> List[Dict[str, Any]]:
+        rows = self._fetch_memories([memory_id for memory_id, _ in ranked],
+                                    ["prompt", "response", "intent", "priority", "created_at"])
+        results = []
+        for memory_id, score in ranked:
+            row = rows.get(memory_id)
+            if row is None:
+                continue
+            row["score"] = float(score)
+            row.update(extra)
+            results.append(row)
+        return results
+
+    def search_text(self, query: str, k: int = 10, intent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """prompt ve response üzerinde BM25 ile anahtar kelime araması (kelimelerden herhangi biri)"""
+        try:
+            terms = self._fts_terms(query)
+            if not self.fts_enabled or not terms:
+                return []
+            return self._results_for(self._text_rank(" OR ".join(terms), k, intent))
+        except Exception as e:
+            logger.error(f"search_text hatası: {str(e)}")
+            return []
+
+    @staticmethod
+    def _coverage_terms(text: str) -> set:
+        """Kapsama oranı için FTS5 tokenizer'ına yakın (küçük harf, aksansız) kelime kümesi"""
+        text = unicodedata.normalize("NFKD", str(text).replace("İ", "i").replace("I", "ı").lower())
+        return set(re.findall(r"\w+", "".join(ch for ch in text if not unicodedata.combining(ch))))
+
+    def _confident_text_match(self, query: str, intent: Optional[str] = None,
+                              confidence_ratio: float = 1.5,
+                              min_coverage: float = 0.5) -> Optional[Tuple[int, float]]:
+        """BM25'in tek başına yanıt verebileceği kadar emin olduğu kaydı döner.
+
+        Sorgudaki tüm kelimeler kaydın prompt'unda geçmeli, en iyi skor
+        ikinciden en az confidence_ratio kat yüksek olmalı (tek sonuç varsa bu
+        koşul aranmaz) ve sorgu prompt'un kelimelerinin en az min_coverage
+        kadarını kapsamalıdır; "kodu" gibi kısa bir sorgu uzun bir prompt'la
+        tek başına eşleşse de emin sayılmaz.
+        """
+        terms = self._fts_terms(query)
+        if not self.fts_enabled or not terms:
+            return None
+        ranked = self._text_rank(f"prompt : ({' AND '.join(terms)})", 2, intent)
+        if not ranked:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < confidence_ratio * max(ranked[1][1], 1e-9):
+            return None
+        row = self._fetch_memories([ranked[0][0]], ["prompt"]).get(ranked[0][0])
+        if row is None:
+            return None
+        prompt_terms = self._coverage_terms(row["prompt"])
+        coverage = len(prompt_terms & self._coverage_terms(query)) / max(len(prompt_terms), 1)
+        if coverage < min_coverage:
+            logger.debug(f"BM25 eşleşmesi prompt'un yalnızca %{coverage * 100:.0f} kadarını kapsıyor")
+            return None
+        return ranked[0]
+
+    def find_text_response(self, query: str, intent: Optional[str] = None,
+                           confidence_ratio: float = 1.5, min_coverage: float = 0.5) -> Optional[Dict[str, Any]]:
+        """BM25 eminse embedding hesaplamadan yanıt döner, değilse None"""
+        try:
+            match = self._confident_text_match(query, intent, confidence_ratio, min_coverage)
+            if match is None:
+                return None
+            results = self._results_for([match], source="bm25")
+            if not results:
+                return None
+            logger.info(f"BM25 ile yanıt bulundu - ID: {match[0]}, Skor: {match[1]}")
+            self.update_usage_stats(match[0])
+            return results[0]
+        except Exception as e:
+            logger.error(f"find_text_response hatası: {str(e)}")
+            return None
+
+    def hybrid_search(self, query: str, query_embedding=None, k: int = 5, intent: Optional[str] = None,
+                      rrf_k: int = 60, candidates: int = 50, confidence_ratio: float = 1.5,
+                      min_coverage: float = 0.5) -> List[Dict[str, Any]]:
+        """BM25 ve kosinüs sıralamalarını karşılıklı sıra füzyonuyla (RRF) birleştirir.
+
+        query_embedding bir dizi veya embedding'i üreten bir fonksiyon olabilir.
+        BM25 eminse yalnızca metin sonuçları döner (emin eşleşme ilk sırada);
+        fonksiyon çağrılmaz ve vektör taraması yapılmaz. Sonuçlardaki "source" alanı hangi yolun
+        kullanıldığını gösterir ("bm25" veya "hybrid").
+        """
+        try:
+            lexical = []
+            terms = self._fts_terms(query)
+            if self.fts_enabled and terms:
+                confident = self._confident_text_match(query, intent, confidence_ratio, min_coverage)
+                if confident is not None:
+                    # Emin eşleşme her zaman ilk sırada; kalanlar OR sıralamasından doldurulur
+                    others = [hit for hit in self._text_rank(" OR ".join(terms), k, intent) if hit[0] != confident[0]]
+                    return self._results_for([confident] + others[:max(k - 1, 0)], source="bm25")
+                lexical = self._text_rank(" OR ".join(terms), candidates, intent)
+
+            semantic = []
+            if query_embedding is not None:
+                embedding = query_embedding() if callable(query_embedding) else query_embedding
+                semantic = [(hit["id"], hit["score"]) for hit in self.search(embedding, k=candidates, intent=intent)]
+
+            fused: Dict[int, float] = {}
+            for ranked in (lexical, semantic):
+                for rank, (memory_id, _) in enumerate(ranked):
+                    fused[memory_id] = fused.get(memory_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            bm25 = dict(lexical)
+            cosine = dict(semantic)
+            best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+
+            results = self._results_for(best, source="hybrid")
+            for result in results:
+                result["bm25"] = bm25.get(result["id"])
+                result["cosine"] = cosine.get(result["id"])
+            return results
+        except Exception as e:
+            logger.error(f"hybrid_search hatası: {str(e)}")
+            return []
+
+    def find_exact_response(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Normalize edilmiş prompt'u birebir aynı olan kaydı embedding hesaplamadan bulur.
+
+        Birden fazla eşleşme varsa önceliği ve kullanımı en yüksek olan seçilir.
+        Bulunamazsa None döner.
+        """
+        try:
+            key = prompt_hash(prompt)
+            if key is None:
+                return None
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, prompt, response, intent
+                    FROM memories
+                    WHERE prompt_hash = ?
+                    ORDER BY priority DESC, usage_count DESC, id DESC
+                """, (key,))
+                normalized = normalize_prompt(prompt)
+                row = next((row for row in cursor if normalize_prompt(row[1]) == normalized), None)
+            if row is None:
+                return None
+
+            memory_id, stored_prompt, response, intent = row
+            logger.info(f"Birebir eşleşme bulundu - ID: {memory_id}")
+            self.update_usage_stats(memory_id, 1.0)
+            return {"id": memory_id, "prompt": stored_prompt, "response": response,
+                    "intent": intent or "genel", "score": 1.0}
+        except Exception as e:
+            logger.error(f"find_exact_response hatası: {str(e)}")
+            return None
+
+    def find_best_response(self, query_embedding: np.ndarray, intent: Optional[str] = None,
+                           filters: Optional[Dict[str, Any]] = None,
+                           min_score: float = 0.0) -> Tuple[Optional[str], float]:
+        """En iyi yanıtı bul; filters search() ile aynıdır.
+
+        intent verilirse önce o intent'in bölümünde arar; çağıran yanıtı ancak
+        min_score ve üstünde kabul edecekse bölümün daha düşük skorlu en iyisi
+        yerine tüm indeks taranır.
+        """
+        try:
+            query_vector = self._prepare_query(query_embedding)
+            if query_vector is None:
+                return None, 0.0
+
+            for _ in range(MISSING_RETRIES + 1):
+                ids, scores, _ = self._search_index(query_vector, 1, intent, filters, min_score)
+                if len(ids) == 0:
                     return None, 0.0
-                    
-                # En yüksek benzerlik skoruna sahip yanıtı bul
-                best_response, best_similarity, best_memory_id = max(similarities, key=lambda x: x[1])
-                
+                best_memory_id = int(ids[0])
+                best_similarity = float(scores[0])
+
                 logger.info(f"En iyi yanıt bulundu - ID: {best_memory_id}, Benzerlik: {best_similarity}")
-                
+
                 # Benzerlik skoru çok düşükse None döndür
-                if best_similarity < 0.5:  # Eşik değerini düşürdüm
+                if best_similarity < self.similarity_threshold:
                     logger.warning(f"En iyi benzerlik skoru çok düşük: {best_similarity}")
                     return None, best_similarity
-                
-                # Kullanım istatistiklerini güncelle
-                self.update_usage_stats(best_memory_id, best_similarity)
-                
-                return best_response, best_similarity
+
+                rows = self._fetch_memories([best_memory_id], ["response"])
+                if not self._forget_missing([best_memory_id], rows):
+                    row = rows[best_memory_id]
+                    break
+            else:
+                return None, 0.0
+
+            # Kullanım istatistiklerini güncelle
+            self.update_usage_stats(best_memory_id, best_similarity)
+
+            return row["response"], best_similarity
                 
         except Exception as e:
             logger.error(f"find_best_response hatası: {str(e)}")
             return None, 0.0
 
+    def find_best_responses(self, query_matrix: np.ndarray) -> List[Tuple[Optional[str], float]]:
+        """Bir sorgu matrisinin her satırı için en iyi yanıtı tek seferde bul"""
+        try:
+            query_matrix = np.asarray(query_matrix, dtype=np.float32)
+            if query_matrix.ndim != 2 or len(query_matrix) == 0:
+                logger.error(f"query_matrix (Q, dim) boyutunda olmalı, şu an: {query_matrix.shape}")
+                return []
+
+            results: List[Tuple[Optional[str], float]] = [(None, 0.0)] * len(query_matrix)
+            queries, valid = normalize_rows(query_matrix)
+
+            self._ensure_index_loaded()
+            self._sync_index()
+            if self._index is None or len(self._index) == 0:
+                logger.warning("Veritabanında hiç bellek bulunamadı")
+                return results
+            if self._index.dim != queries.shape[1]:
+                logger.warning(f"Embedding boyutları uyuşmuyor: {self._index.dim} != {queries.shape[1]}")
+                return results
+
+            with self._index_lock:
+                if self.ranker.enabled:
+                    # Her sorgunun adayları önsellerle yeniden sıralanır
+                    ids, scores = self._index.search_batch(queries, k=self.ranker.candidates)
+                    ranked = [self.ranker.rank(self._index, ids[i][ids[i] >= 0], scores[i][ids[i] >= 0], 1)
+                              for i in range(len(queries))]
+                    ids = np.array([[row[0][0] if len(row[0]) else -1] for row in ranked], dtype=np.int64).reshape(-1, 1)
+                    scores = np.array([[row[1][0] if len(row[1]) else -np.inf] for row in ranked], dtype=np.float32).reshape(-1, 1)
+                else:
+                    ids, scores = self._index.search_batch(queries, k=1)
+            if ids.shape[1] == 0:
+                return results
+
+            best_ids, best_scores = ids[:, 0], scores[:, 0]
+            matched = valid & (best_ids >= 0) & (best_scores >= self.similarity_threshold)
+            candidates = np.unique(best_ids[matched]).tolist()
+            rows = self._fetch_memories(candidates, ["response"])
+            self._forget_missing(candidates, rows)
+
+            hits = []
+            for i in range(len(queries)):
+                if not valid[i] or best_ids[i] < 0:
+                    continue
+                if matched[i] and int(best_ids[i]) not in rows:
+                    # En iyi aday başka bir süreçte silinmiş; bu sorgu tek başına yeniden aranır
+                    results[i] = self.find_best_response(query_matrix[i])
+                    continue
+                similarity = float(best_scores[i])
+                row = rows.get(int(best_ids[i]))
+                if matched[i] and row is not None:
+                    results[i] = (row["response"], similarity)
+                    hits.append((int(best_ids[i]), similarity))
+                else:
+                    results[i] = (None, similarity)
+
+            # Kullanım istatistikleri tüm toplu sorgu için tek transaction'da
+            self.update_usage_stats_many(hits)
+            return results
+
+        except Exception as e:
+            logger.error(f"find_best_responses hatası: {str(e)}")
+            return []
+
     def get_all_memories(self) -> List[dict]:
         """Tüm bellekleri getir"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, prompt, response, intent, created_at 
-                FROM memories 
-                ORDER BY created_at DESC
-            """)
-            
-            memories = []
-            for row in cursor.fetchall():
-                memories.append({
-                    "id": row[0],
-                    "prompt": row[1],
-                    "response": row[2],
-                    "intent": row[3],
-                    "created_at": row[4]
-                })
-            
-            conn.close()
-            return memories
-            
+            return list(self.iter_memories(["id", "prompt", "response", "intent", "created_at"], newest_first=True))
         except Exception as e:
             logger.error(f"Bellek getirme hatası: {str(e)}")
             return []
@@ -0,0 +1,34 @@
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_sqlite import SQLiteMemoryManager, manager_params_from_settings
+from settings import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def consolidate_memories(db_path: str, threshold: float, match_response: bool, tables: int) -> int:
+    """Yakın tekrar bellekleri kanonik kayıtlarda birleştirir"""
+    manager = SQLiteMemoryManager(db_path=db_path, **manager_params_from_settings(settings))
+    try:
+        merged = manager.consolidate_near_duplicates(threshold=threshold, match_response=match_response,
+                                                     tables=tables)
+    finally:
+        manager.close()
+    logger.info(f"{merged} kayıt birleştirildi")
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yakın tekrar bellekleri LSH ile bulup birleştirir")
+    parser.add_argument("--db", default="memory.db", help="SQLite veritabanı yolu")
+    parser.add_argument("--threshold", type=float, default=0.95, help="Kosinüs benzerliği eşiği")
+    parser.add_argument("--tables", type=int, default=16, help="LSH tablo sayısı")
+    parser.add_argument("--any-response", action="store_true",
+                        help="Yanıtı farklı olan kayıtları da birleştir")
+    args = parser.parse_args()
+
+    consolidate_memories(args.db, args.threshold, not args.any_response, args.tables)
@@ -0,0 +1,36 @@
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_sqlite import SQLiteMemoryManager, manager_params_from_settings
+from settings import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def fit_projection(db_path: str, dims: int, sample_size: int):
+    """Veritabanındaki embedding'ler için PCA izdüşümünü çevrimdışı uydur"""
+    manager = SQLiteMemoryManager(db_path=db_path, **manager_params_from_settings(settings))
+    try:
+        version = manager.fit_projection(dims=dims, sample_size=sample_size)
+    finally:
+        # Kullanım tamponunu yazar ve arka plan iş parçacığını durdurur
+        manager.close()
+    if version is None:
+        logger.error("İzdüşüm oluşturulamadı")
+        return None
+    logger.info(f"İzdüşüm dosyası: {manager.projection_path} (sürüm {version})")
+    return version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bellek embedding'leri için PCA izdüşümü uydurur")
+    parser.add_argument("--db", default="memory.db", help="SQLite veritabanı yolu")
+    parser.add_argument("--dims", type=int, default=128, help="İzdüşüm boyutu")
+    parser.add_argument("--sample-size", type=int, default=50000, help="Uydurmada kullanılacak en fazla kayıt")
+    args = parser.parse_args()
+
+    if fit_projection(args.db, args.dims, args.sample_size) is None:
+        sys.exit(1)
@@ -0,0 +1,93 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_sqlite import SQLiteMemoryManager, manager_params_from_settings
+from settings import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """export_tools çıktısı biçimindeki JSON, JSONL veya CSV dosyasını satır satır okur"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            for row in csv.DictReader(f):
+                tags = row.get("tags")
+                if tags:
+                    try:
+                        row["tags"] = json.loads(tags)
+                    except ValueError:
+                        # csv.DictWriter listeleri Python gösterimiyle yazar
+                        row["tags"] = [tag.strip(" '\"") for tag in tags.strip("[]").split(",") if tag.strip(" '\"")]
+                yield {key: (value if value != "" else None) for key, value in row.items()}
+        elif extension == ".json":
+            yield from json.load(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def ingest_memories(db_path: str, path: str, model_name: str, chunk_size: int, batch_size: int,
+                    embed: bool = True) -> int:
+    """Kayıtları parçalar halinde kodlayıp bellek veritabanına ekler"""
+    encode = None
+    if embed:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+
+        def encode(texts):
+            return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    manager = SQLiteMemoryManager(db_path=db_path, **manager_params_from_settings(settings))
+    count = 0
+    try:
+        records = read_records(path)
+        while True:
+            chunk = [record for _, record in zip(range(chunk_size), records)]
+            if not chunk:
+                break
+            memory_ids = manager.add_memories(chunk, encode=encode, chunk_size=chunk_size)
+            count += sum(memory_id is not None for memory_id in memory_ids)
+            logger.info(f"{count} kayıt işlendi")
+    finally:
+        manager.close()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt-yanıt çiftlerini bellek veritabanına toplu ekler")
+    parser.add_argument("path", help="JSON, JSONL veya CSV dosyası (export_tools biçimi) ya da --archive ile arşiv")
+    parser.add_argument("--db", default="memory.db", help="SQLite veritabanı yolu")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Embedding modeli")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="İşlem başına kayıt sayısı")
+    parser.add_argument("--batch-size", type=int, default=64, help="Model kodlama grup boyutu")
+    parser.add_argument("--no-embed", action="store_true", help="Embedding hesaplamadan ekle")
+    parser.add_argument("--archive", action="store_true",
+                        help="Kapasite sınırıyla arşivlenmiş kayıtları (.jsonl.gz) embedding'leriyle geri yükle")
+    args = parser.parse_args()
+
+    if args.archive:
+        manager = SQLiteMemoryManager(db_path=args.db, **manager_params_from_settings(settings))
+        try:
+            manager.import_archive(args.path, chunk_size=args.chunk_size)
+        finally:
+            manager.close()
+        sys.exit(0)
+
+    try:
+        total = ingest_memories(args.db, args.path, args.model, args.chunk_size, args.batch_size,
+                                embed=not args.no_embed)
+        logger.info(f"Toplam {total} kayıt işlendi (tekrarlar mevcut kaydı günceller)")
+    except Exception as e:
+        logger.error(f"Toplu ekleme hatası: {str(e)}")
+        sys.exit(1)
@@ -15,6 +15,35 @@ DEFAULT_SETTINGS = {
     "TTS_VOICE": "tr-TR-Standard-A",  # Google Cloud TTS sesi
     "TTS_PITCH": 0,  # Normal pitch
     "TTS_SPEAKING_RATE": 1.0,  # Normal hız
+    "MEMORY_INDEX_TYPE": "exact",  # exact, hnsw veya ivf
+    "MEMORY_INDEX_PARAMS": {
+        # quantization: none veya int8 (MEMORY_EMBEDDING_SIDECAR gerektirir); prefilter: none veya binary
+        # projection: none veya pca (memory.db.pca.npz, scripts/fit_projection.py ile uydurulur)
+        "exact": {"quantization": "none", "rescore_k": 64, "prefilter": "none", "prefilter_k": 1024,
+                  "projection": "none"},
+        "hnsw": {"M": 16, "ef_construction": 200, "ef": 64},
+        "ivf": {"nlist": 0, "nprobe": 8},  # nlist=0: kayıt sayısına göre otomatik
+    },
+    "MEMORY_EMBEDDING_SIDECAR": True,  # memory.db.vectors dosyasını süreçler arasında paylaş
+    # Sıralama önselleri: kosinüs + öncelik, log(kullanım) ve güncellik (yarı ömür gün); 0 = kapalı
+    "MEMORY_RANKING": {"priority": 0.0, "usage": 0.0, "recency": 0.0, "half_life_days": 30, "candidates": 50},
+    "MEMORY_USAGE_FLUSH_INTERVAL": 5.0,  # kullanım istatistiklerini biriktirip kaç saniyede bir yaz (0 = hemen)
+    "MEMORY_CHECKPOINT_EVERY": 10000,  # günlükte bu kadar değişiklik birikince indeks kaydedilip günlük budanır (0 = kapalı)
+    # Bellek veritabanı bağlantılarına uygulanan PRAGMA'lar (cache_size negatifse KiB)
+    "MEMORY_SQLITE_PRAGMAS": {"journal_mode": "wal", "synchronous": "normal", "mmap_size": 268435456,
+                              "cache_size": -65536, "busy_timeout": 5000, "temp_store": "memory"},
+    # Yakın tekrar birleştirme işi: kaç saniyede bir (0 = kapalı) ve kosinüs eşiği
+    "MEMORY_CONSOLIDATION_INTERVAL": 0,
+    "MEMORY_CONSOLIDATION_THRESHOLD": 0.95,
+    # Kapasite sınırı (0 = sınırsız); fazlası lfu/lru politikasıyla memory.db.archive.jsonl.gz'ye taşınır,
+    # priority_floor ve üstü öncelikli kayıtlar ile son grace_seconds içinde eklenenler korunur
+    "MEMORY_RETENTION": {"capacity": 0, "policy": "lfu", "priority_floor": 3, "check_every": 100,
+                         "grace_seconds": 3600},
+    # Kiracı başına ayrı veritabanı (memory_shards/<kiracı>.db); en fazla max_open parça açık tutulur
+    "MEMORY_SHARDING": {"enabled": False, "base_dir": "memory_shards", "max_open": 16},
+    "MEMORY_SEARCH_MODE": "vector",  # vector veya hybrid (BM25 eminse embedding hesaplanmaz)
+    "MEMORY_BM25_CONFIDENCE": 1.5,  # en iyi BM25 skoru ikinciden bu kat yüksekse yeterli sayılır
+    "MEMORY_BM25_MIN_COVERAGE": 0.5,  # sorgu eşleşen prompt'un kelimelerinin en az bu kadarını kapsamalı
 }
 
 # Ayarları yükle
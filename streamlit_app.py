@@ -168,6 +168,10 @@ class CloudLLMApp:
 
     def main(self):
         """Ana uygulama"""
+        # Her yeniden çalıştırma yeni bir bağlamda başlar; bellek işlemleri oturumdaki kullanıcıya yönlendirilir
+        if self.cloud_ai is not None:
+            self.cloud_ai.set_user(st.session_state.user_id)
+        
         # Karanlık mod CSS'i
         if st.session_state.dark_mode:
             st.markdown("""